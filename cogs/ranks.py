@@ -1,234 +1,468 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import json
 import os
 import random
 from dotenv import load_dotenv
 import asyncio  # Added for async sleep
+import io
+import time
+import typing
+from core.bulk import run_bounded, with_retry
+from core.coalesce import BurstCoalescer
+from core.cooldowns import CooldownTable
+from core.backfill import HistoryBackfill
+from core.files import atomic_write_json
+from core import rank_card
+from core.levels import LevelRoleCache, LevelTable
+from core.pipeline import PRIORITY_XP, get_pipeline
+from core.rank_store import RankStore
+from core.seasons import Decay, season_key as season_of
+from core.voice import VoiceSessions
+from core.xp_rules import VOICE_XP_PER_MINUTE, XP_COOLDOWN_SECONDS, XP_MAX_GAIN, XP_MIN_GAIN, eligible_content, voice_earners
 
 load_dotenv()  # Load .env variables
 
 LEVEL_UP_CHANNEL = os.getenv("LEVEL_UP_CHANNEL", "ranks")
 MOD_LOG_CHANNEL = os.getenv("MOD_LOG_CHANNEL", "mod-log")
 DATA_FILE = "data/ranks_data.json"
+JOURNAL_FILE = "data/ranks_journal.jsonl"
+JOURNAL_COMPACT_BYTES = int(os.getenv("RANKS_JOURNAL_COMPACT_BYTES", 1_000_000))
 XP_COOLDOWN_FILE = "data/xp_cooldown.json"
+VOICE_SESSIONS_FILE = "data/voice_sessions.json"
+VOICE_HEARTBEAT_FILE = "data/voice_heartbeat.json"
 LEVELS_FILE = "data/levels.json"
-
-# Updated LEVELS list based on the new role names
-LEVELS = [
-    (0, "WorkshopIntern"),
-    (150, "JuniorEngineer"),
-    (350, "CozyCrafter"),
-    (600, "ResourceWrangler"),
-    (900, "FactoryForeman"),
-    (1300, "ScrapSpecialist"),
-    (1800, "BlueprintBuff"),
-    (2400, "MechanicMaestro"),
-    (3100, "AutomationAlchemist"),
-    (3900, "BuildBanshee"),
-    (4800, "LootGoblin"),
-    (5800, "MythicModuleMaster"),
-    (6900, "ArchitectofEfficiency"),
-    (8100, "DadcoreOverlord"),
-    (9400, "EternalFabricator"),
+RANKS_FLUSH_SECONDS = int(os.getenv("RANKS_FLUSH_SECONDS", 5))
+XP_PREFIX = os.getenv("PREFIX", "!")
+BACKFILL_STATE_DIR = "data/backfill"
+SEASONS_DIR = "data/seasons"
+# Season scores lose SEASON_DECAY_RATE per day once a member has been idle for SEASON_DECAY_GRACE_DAYS
+SEASON_DECAY = Decay(float(os.getenv("SEASON_DECAY_GRACE_DAYS", 7)), float(os.getenv("SEASON_DECAY_RATE", 0.02)))
+LEADERBOARD_PAGE_SIZE = 10
+ROLE_SYNC_STATE_FILE = "data/role_sync_state.json"
+ROLE_SYNC_CONCURRENCY = int(os.getenv("ROLE_SYNC_CONCURRENCY", 3))
+LEVEL_UP_WORKERS = int(os.getenv("LEVEL_UP_WORKERS", 2))
+LEVEL_UP_ANNOUNCE_WINDOW = float(os.getenv("LEVEL_UP_ANNOUNCE_WINDOW", 30))
+RANK_CARD_WORKERS = int(os.getenv("RANK_CARD_WORKERS", 2))
+RANK_CARD_CACHE_SIZE = int(os.getenv("RANK_CARD_CACHE_SIZE", 256))
+RANK_CARD_FONT = os.getenv("RANK_CARD_FONT", "DejaVuSans.ttf")
+RANK_CARD_BOLD_FONT = os.getenv("RANK_CARD_BOLD_FONT", "DejaVuSans-Bold.ttf")
+RANK_CARD_BACKGROUND = os.getenv("RANK_CARD_BACKGROUND", "data/rank_card_background.png")
+
+# Default level curve, written to levels.json if the file is missing
+DEFAULT_LEVELS = [
+    (0, "Workshop Intern"),
+    (150, "Junior Engineer"),
+    (350, "Cozy Crafter"),
+    (600, "Resource Wrangler"),
+    (900, "Factory Foreman"),
+    (1300, "Scrap Specialist"),
+    (1800, "Blueprint Buff"),
+    (2400, "Mechanic Maestro"),
+    (3100, "Automation Alchemist"),
+    (3900, "Build Banshee"),
+    (4800, "Loot Goblin"),
+    (5800, "Mythic Module Master"),
+    (6900, "Architect of Efficiency"),
+    (8100, "Dadcore Overlord"),
+    (9400, "Eternal Fabricator"),
 ]
 
-# Load levels from the levels JSON file (if you still want to use a file for flexibility)
-def load_levels():
-    if os.path.exists(LEVELS_FILE):
-        with open(LEVELS_FILE, "r") as f:
-            return json.load(f)
-    else:
-        # Save to a JSON file if it doesn't exist
-        with open(LEVELS_FILE, "w") as f:
-            json.dump(LEVELS, f, indent=4)
-        return LEVELS
+# Role names the bot used before levels.json (no spaces). Guilds set up back then still have these roles,
+# so they are recognised as the same levels instead of being duplicated under the new names.
+LEGACY_LEVEL_NAMES = {name.replace(" ", ""): name for _, name in DEFAULT_LEVELS}
+
+# levels.json is the single source of truth for thresholds and role names
+LEVELS = LevelTable.load(LEVELS_FILE, DEFAULT_LEVELS, LEGACY_LEVEL_NAMES)
 
 class RankCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.xp_cooldown = self.load_xp_cooldown()  # Load cooldown from file
+        self.xp_cooldown = CooldownTable(XP_COOLDOWN_SECONDS)
+        self.xp_cooldown.load(XP_COOLDOWN_FILE, time.time())  # Load cooldown snapshot from file
+        self.voice_sessions = VoiceSessions()
+        self.voice_sessions.load(VOICE_SESSIONS_FILE, VOICE_HEARTBEAT_FILE)  # Open voice sessions survive restarts
         self.level_up_channel_name = LEVEL_UP_CHANNEL
+        self.role_sync_task = None
+        self.level_roles = LevelRoleCache(LEVELS)
+        self.level_up_channels = {}
+        self.level_up_queue = asyncio.Queue()
+        self.pending_level_ups = {}
+        self.level_up_workers = []
+        self.backfill_tasks = {}
+        self.level_up_announcer = BurstCoalescer(LEVEL_UP_ANNOUNCE_WINDOW, self.announce_level_up, self.announce_level_ups)
+        self.rank_cards = rank_card.RankCardRenderer(RANK_CARD_WORKERS, RANK_CARD_CACHE_SIZE, RANK_CARD_FONT,
+                                                     RANK_CARD_BOLD_FONT, RANK_CARD_BACKGROUND)
+
+        # Rank data lives in memory; grants are journaled in the background
+        self.store = RankStore(DATA_FILE, JOURNAL_FILE, SEASONS_DIR, SEASON_DECAY, compact_bytes=JOURNAL_COMPACT_BYTES)
+        self.store.load()
+        self.leaderboard_pages = LeaderboardPages(LEADERBOARD_PAGE_SIZE)
+        self.store.on_reorder = self.leaderboard_pages.invalidate
+        self.flush_ranks.start()
         print("[Ranks] Cog loaded.")
 
-        # Ensure data directory exists
-        os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-        if not os.path.exists(DATA_FILE):
-            with open(DATA_FILE, "w") as f:
-                json.dump({}, f)
-
-    def load_xp_cooldown(self):
-        """Load XP cooldown data from JSON."""
-        if os.path.exists(XP_COOLDOWN_FILE):
-            with open(XP_COOLDOWN_FILE, "r") as f:
-                return json.load(f)
-        return {}
-
-    def save_xp_cooldown(self):
-        """Save XP cooldown data to JSON."""
-        with open(XP_COOLDOWN_FILE, "w") as f:
-            json.dump(self.xp_cooldown, f, indent=4)
-
-    def load_data(self):
-        """Load the rank data."""
-        with open(DATA_FILE, "r") as f:
-            return json.load(f)
-
-    def save_data(self, data):
-        """Save the rank data."""
-        with open(DATA_FILE, "w") as f:
-            json.dump(data, f, indent=4)
+    async def cog_load(self):
+        get_pipeline(self.bot).register("ranks", self.award_message_xp, PRIORITY_XP)
+        self.level_up_workers = [asyncio.create_task(self.level_up_worker()) for _ in range(LEVEL_UP_WORKERS)]
+
+    async def cog_unload(self):
+        get_pipeline(self.bot).unregister("ranks")
+        self.flush_ranks.cancel()
+        for worker in self.level_up_workers:
+            worker.cancel()
+        for task in self.backfill_tasks.values():
+            task.cancel()
+        await self.level_up_announcer.close()
+        if self.role_sync_task:
+            self.role_sync_task.cancel()
+        self.rank_cards.close()
+        # Open voice sessions stay open; their start times are saved and picked up on the next start
+        await self.save_voice_sessions(force=True)
+        await self.store.flush()
+        await self.save_xp_cooldown()
+
+    @tasks.loop(seconds=RANKS_FLUSH_SECONDS)
+    async def flush_ranks(self):
+        """Append queued XP records to the journal, plus snapshot live cooldowns."""
+        try:
+            # Roll the season over on the first flush of a new month
+            current_season = season_of(time.time())
+            if current_season != self.store.season_key:
+                print(f"[Ranks] Season {self.store.season_key} ended; starting {current_season}.")
+                await self.store.rollover(current_season)
+            await self.save_voice_sessions()
+            await self.store.flush()
+            await self.save_xp_cooldown()
+        except OSError as e:
+            print(f"⚠️ Failed to save rank data: {e}")
+
+    async def save_xp_cooldown(self):
+        """Expire finished cooldowns and snapshot the rest if anything changed."""
+        self.xp_cooldown.sweep(time.time())
+        if not self.xp_cooldown.changed:
+            return
+        snapshot = self.xp_cooldown.snapshot(time.time())
+        await asyncio.to_thread(atomic_write_json, XP_COOLDOWN_FILE, snapshot)
+
+    async def save_voice_sessions(self, force=False):
+        """Snapshot open voice session start times if any opened or closed.
+
+        Otherwise, while anyone is in a session, only a timestamp is written, so after a
+        crash members who left while the bot was down are credited up to the last flush
+        rather than the last join or leave.
+        """
+        now = time.time()
+        if force or self.voice_sessions.changed:
+            snapshot = self.voice_sessions.snapshot(now)
+            await asyncio.to_thread(atomic_write_json, VOICE_SESSIONS_FILE, snapshot)
+        elif len(self.voice_sessions):
+            self.voice_sessions.saved_at = now
+            await asyncio.to_thread(atomic_write_json, VOICE_HEARTBEAT_FILE, {"saved_at": now})
 
     @commands.Cog.listener()
     async def on_ready(self):
         """Check that everyone has the correct role on startup."""
-        print("Bot is ready! Checking all members' roles...")
+        for guild in self.bot.guilds:
+            self.level_roles.build(guild)
+        self.resume_voice_sessions()
 
-        # Wait for a brief moment to allow all members to load before proceeding
-        await asyncio.sleep(5)  # Delay for 5 seconds, you can adjust this as needed
+        # on_ready fires again after reconnects; only one reconciliation runs at a time
+        if self.role_sync_task and not self.role_sync_task.done():
+            return
+        self.role_sync_task = asyncio.create_task(self.reconcile_roles())
+
+    async def reconcile_roles(self):
+        """Diff every ranked member's level role against their XP and fix mismatches in bulk."""
+        print("Bot is ready! Checking all members' roles...")
+        started = time.monotonic()
+        state = self.load_role_sync_state()
+        total_updated = 0
 
         for guild in self.bot.guilds:
-            data = self.load_data()
-            guild_id = str(guild.id)
-            if guild_id not in data:
+            guild_key = str(guild.id)
+            if guild_key in state["completed"]:
                 continue
+            guild_data = self.store.guild(guild.id)
+            if not guild_data:
+                continue
+
+            if not guild.chunked:
+                await guild.chunk()
 
-            # Iterate through all members of the server
-            for member in guild.members:
-                user_id = str(member.id)
-                if user_id in data[guild_id]:
-                    user_data = data[guild_id][user_id]
-                    current_level = user_data["level"]
-                    current_level_name = LEVELS[current_level][1]  # Get the role name based on the current level
-
-                    # Check if the user has the correct role
-                    role = discord.utils.get(guild.roles, name=current_level_name)
-                    if role:
-                        if role not in member.roles:
-                            # If the user doesn't have the correct role, assign it
-                            try:
-                                await member.add_roles(role)
-                                # Remove the old role corresponding to the previous level
-                                old_level_name = LEVELS[user_data["level"]][1]
-                                old_role = discord.utils.get(guild.roles, name=old_level_name)
-                                if old_role in member.roles:
-                                    await member.remove_roles(old_role)
-                            except discord.Forbidden:
-                                print(f"Missing permissions to modify roles for {member.display_name} in {guild.name}")
-                    else:
-                        # Role does not exist, create it and assign it
-                        try:
-                            role = await guild.create_role(name=current_level_name)
-                            await member.add_roles(role)
-                            old_level_name = LEVELS[user_data["level"]][1]
-                            old_role = discord.utils.get(guild.roles, name=old_level_name)
-                            if old_role in member.roles:
-                                await member.remove_roles(old_role)
-                        except discord.Forbidden:
-                            print(f"Missing permissions to create or modify roles for {member.display_name} in {guild.name}")
-
-        print("Role verification completed for all members.")
+            changes = await self.plan_role_changes(guild, guild_data, set(state["members"].get(guild_key, [])))
+            if changes is None:
+                continue
+
+            done_ids = state["members"].setdefault(guild_key, [])
+
+            async def apply(change):
+                member, roles = change
+                await with_retry(lambda: member.edit(roles=roles, reason="Rank role sync"))
+                done_ids.append(member.id)
+
+            async def report(done, failed):
+                print(f"[Ranks] Role sync in {guild.name}: {done}/{len(changes)} members ({len(failed)} failed)")
+                await asyncio.to_thread(atomic_write_json, ROLE_SYNC_STATE_FILE, state)
+
+            done, failed = await run_bounded(changes, apply, concurrency=ROLE_SYNC_CONCURRENCY, on_progress=report)
+            for (member, _), error in failed:
+                print(f"Failed to update roles for {member.display_name} in {guild.name}: {error}")
+            total_updated += done - len(failed)
+
+            state["completed"].append(guild_key)
+            state["members"].pop(guild_key, None)
+            await asyncio.to_thread(atomic_write_json, ROLE_SYNC_STATE_FILE, state)
+
+        # Finished cleanly, so the next startup begins a fresh pass
+        if os.path.exists(ROLE_SYNC_STATE_FILE):
+            os.remove(ROLE_SYNC_STATE_FILE)
+        print(f"Role verification completed for all members: {total_updated} updated in {time.monotonic() - started:.1f}s.")
+
+    async def plan_role_changes(self, guild, guild_data, skip_ids):
+        """Return ``[(member, new_roles)]`` for members whose level role is wrong, creating missing roles once."""
+        level_roles = {index: guild.get_role(role_id) for index, role_id in self.level_roles.roles_for(guild).items()}
+
+        needed = {guild_data.get(member.id).level for member in guild.members if member.id in guild_data}
+        for index in sorted(needed - set(level_roles)):
+            try:
+                level_roles[index] = await guild.create_role(name=LEVELS.names[index])
+            except discord.Forbidden:
+                print(f"Missing permissions to create level roles in {guild.name}")
+                return None
+            self.level_roles.add(level_roles[index])
+
+        # Includes any duplicate level roles (e.g. a legacy-named one) so members don't keep both
+        level_role_ids = self.level_roles.role_ids(guild) | {role.id for role in level_roles.values()}
+        changes = []
+        for member in guild.members:
+            record = guild_data.get(member.id)
+            if record is None or member.id in skip_ids:
+                continue
+            desired = level_roles[record.level]
+            held = {role.id for role in member.roles if role.id in level_role_ids}
+            if held == {desired.id}:
+                continue
+            roles = [role for role in member.roles if role.id not in level_role_ids and not role.is_default()]
+            roles.append(desired)
+            changes.append((member, roles))
+        return changes
+
+    def load_role_sync_state(self):
+        """Load the checkpoint of an interrupted role sync, if there is one."""
+        if os.path.exists(ROLE_SYNC_STATE_FILE):
+            with open(ROLE_SYNC_STATE_FILE, "r") as f:
+                return json.load(f)
+        return {"completed": [], "members": {}}
 
     @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot or not message.guild:
-            return
+    async def on_guild_join(self, guild):
+        self.level_roles.build(guild)
 
-        # Ignore messages shorter than 10 chars and commands (starting with prefix)
-        prefix = os.getenv("PREFIX", "!")
-        if len(message.content) < 10 or message.content.startswith(prefix):
-            return
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.level_roles.forget(guild.id)
+        now = time.time()
+        for guild_id, member_id in self.voice_sessions.keys():
+            if guild_id == guild.id:
+                self.end_voice_session(guild_id, member_id, now)
+        self.level_up_channels.pop(guild.id, None)
 
-        user_id = str(message.author.id)
-        guild_id = str(message.guild.id)
-        key = f"{guild_id}-{user_id}"
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role):
+        self.level_roles.add(role)
 
-        now = message.created_at.timestamp()
-        last_xp_time = self.xp_cooldown.get(key, 0)
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before, after):
+        if self.level_roles.is_relevant(before) or self.level_roles.is_relevant(after):
+            self.level_roles.build(after.guild)
 
-        # Only grant XP if 5 minutes have passed since last XP
-        if now - last_xp_time < 300:
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        if self.level_roles.is_relevant(role):
+            self.level_roles.build(role.guild)
+
+    def get_level_up_channel(self, guild):
+        """Return the guild's level-up channel, caching its ID after the first name lookup."""
+        channel = guild.get_channel(self.level_up_channels.get(guild.id, 0))
+        if channel is None or channel.name != self.level_up_channel_name:
+            channel = discord.utils.get(guild.text_channels, name=self.level_up_channel_name)
+            if channel:
+                self.level_up_channels[guild.id] = channel.id
+        return channel
+
+    async def award_message_xp(self, ctx):
+        """Message pipeline stage; runs after moderation, so deleted messages never reach it."""
+        # The pipeline already skipped bots and DMs; ignore messages shorter than 10 chars and commands
+        if not eligible_content(ctx.content, XP_PREFIX):
             return
+        message = ctx.message
 
-        self.xp_cooldown[key] = now
-        self.save_xp_cooldown()
-
-        # Load data
-        data = self.load_data()
-        if guild_id not in data:
-            data[guild_id] = {}
-        if user_id not in data[guild_id]:
-            data[guild_id][user_id] = {"xp": 0, "level": 0}
+        user_id = message.author.id
+        guild_id = message.guild.id
 
-        user_data = data[guild_id][user_id]
+        # Only grant XP if 5 minutes have passed since last XP
+        now = message.created_at.timestamp()
+        if not self.xp_cooldown.try_acquire((message.guild.id, message.author.id), now):
+            return
 
         # Grant random XP between 5 and 15
-        xp_gain = random.randint(5, 15)
-        user_data["xp"] += xp_gain
+        xp_gain = random.randint(XP_MIN_GAIN, XP_MAX_GAIN)
+        self.grant_xp(guild_id, user_id, xp_gain)
 
-        # Check for level up
-        current_level_index = user_data["level"]
-        new_level_index = current_level_index
+    def grant_xp(self, guild_id, user_id, amount, source="message", now=None):
+        """Add XP to the store and queue a level-up if the member crossed a threshold."""
+        user_data = self.store.add_xp(guild_id, user_id, amount, source=source, now=now)
 
-        for i, (xp_req, role_name) in enumerate(LEVELS):
-            if user_data["xp"] >= xp_req:
-                new_level_index = i
-            else:
-                break
+        # Check for level up
+        current_level_index = user_data.level
+        new_level_index = LEVELS.level_for(user_data.xp)
 
         if new_level_index > current_level_index:
-            user_data["level"] = new_level_index
-            new_level_name = LEVELS[new_level_index][1]
-
-            # Assign new role or create dynamically if not found
-            role = discord.utils.get(message.guild.roles, name=new_level_name)
-            if role:
-                # Remove the old role corresponding to the previous level
-                old_level_name = LEVELS[current_level_index][1]
-                old_role = discord.utils.get(message.guild.roles, name=old_level_name)
-                if old_role in message.author.roles:
-                    try:
-                        await message.author.remove_roles(old_role)
-                    except discord.Forbidden:
-                        print(f"Missing permissions to remove role {old_level_name} from {message.author}")
-
-                # Add the new role
-                try:
-                    await message.author.add_roles(role)
-                except discord.Forbidden:
-                    print(f"Missing permissions to add role {new_level_name} to {message.author}")
-            else:
-                try:
-                    role = await message.guild.create_role(name=new_level_name)
-                    # Remove the old role
-                    old_level_name = LEVELS[current_level_index][1]
-                    old_role = discord.utils.get(message.guild.roles, name=old_level_name)
-                    if old_role in message.author.roles:
-                        await message.author.remove_roles(old_role)
-                    # Add the new role
-                    await message.author.add_roles(role)
-                except discord.Forbidden:
-                    print(f"Missing permissions to create role {new_level_name} for {message.author}")
-
-            # Send level-up notification to configured channel
-            ranks_channel = discord.utils.get(message.guild.text_channels, name=self.level_up_channel_name)
-            level_up_message = f"🎉 {message.author.mention} leveled up to **{new_level_name}**!"
-            if ranks_channel:
-                try:
-                    await ranks_channel.send(level_up_message)
-                except discord.Forbidden:
-                    print(f"Missing permissions to send message to {self.level_up_channel_name}")
-                    mod_log_channel = discord.utils.get(message.guild.text_channels, name=MOD_LOG_CHANNEL)
-                    if mod_log_channel:
-                        await mod_log_channel.send(f"⚠️ Unable to send level-up message to {self.level_up_channel_name} for {message.author.mention}.")
+            self.store.set_level(guild_id, user_id, new_level_index)
+            self.enqueue_level_up(guild_id, user_id, new_level_index)
+
+    @commands.Cog.listener()
+    async def on_voice_state_update(self, member, before, after):
+        """Open and close voice XP sessions as members join, leave, move, mute or deafen."""
+        if member.bot:
+            return
+        now = time.time()
+
+        # Leaving or moving closes the member's session; a move then reopens it in the new channel
+        if before.channel != after.channel:
+            self.end_voice_session(member.guild.id, member.id, now)
+
+        # Joins and leaves can change whether everyone else in those channels is alone
+        for channel in {before.channel, after.channel}:
+            if channel is not None:
+                self.sync_voice_channel(channel, now)
+
+    def sync_voice_channel(self, channel, now):
+        """Open sessions for members of a channel who now earn voice XP and close them for those who don't."""
+        earners = voice_earners(channel)
+        for member in channel.members:
+            if member.bot:
+                continue
+            if member.id in earners:
+                self.voice_sessions.open((channel.guild.id, member.id), now)
             else:
-                print(f"Channel {self.level_up_channel_name} does not exist.")
+                self.end_voice_session(channel.guild.id, member.id, now)
 
-        self.save_data(data)
+    def end_voice_session(self, guild_id, member_id, now):
+        """Close a member's voice session, if one is open, and credit the whole minutes it lasted."""
+        seconds = self.voice_sessions.close((guild_id, member_id), now)
+        if not seconds:
+            return
+        xp_gain = int(seconds // 60) * VOICE_XP_PER_MINUTE
+        if xp_gain:
+            self.grant_xp(guild_id, member_id, xp_gain, source="voice", now=now)
+
+    def resume_voice_sessions(self):
+        """Match saved voice sessions against who is actually in voice after (re)connecting.
+
+        Sessions for members still earning keep their original start time. Sessions
+        for members who left while we weren't listening are credited up to the last
+        snapshot, and members who joined in the meantime start a session now.
+        """
+        now = time.time()
+        live = set()
+        for guild in self.bot.guilds:
+            for channel in guild.voice_channels + guild.stage_channels:
+                for member_id in voice_earners(channel):
+                    live.add((guild.id, member_id))
+                    self.voice_sessions.open((guild.id, member_id), now)
+
+        ended_at = self.voice_sessions.saved_at or now
+        for guild_id, member_id in self.voice_sessions.keys() - live:
+            self.end_voice_session(guild_id, member_id, ended_at)
+
+    def enqueue_level_up(self, guild_id, member_id, level_index):
+        """Queue role and announcement work for a level-up; repeat level-ups for one member merge."""
+        key = (guild_id, member_id)
+        if key in self.pending_level_ups:
+            self.pending_level_ups[key] = max(self.pending_level_ups[key], level_index)
+            return
+        self.pending_level_ups[key] = level_index
+        self.level_up_queue.put_nowait(key)
+
+    async def level_up_worker(self):
+        """Apply queued level-ups: one role edit and one announcement per member."""
+        while True:
+            key = await self.level_up_queue.get()
+            level_index = self.pending_level_ups.pop(key, None)
+            try:
+                if level_index is not None:
+                    await self.apply_level_up(*key, level_index)
+            except Exception as e:
+                print(f"⚠️ Failed to process level-up for {key[1]}: {e}")
+            finally:
+                self.level_up_queue.task_done()
+
+    async def apply_level_up(self, guild_id, member_id, level_index):
+        guild = self.bot.get_guild(guild_id)
+        member = guild.get_member(member_id) if guild else None
+        if member is None:
+            return
+        new_level_name = LEVELS.names[level_index]
+
+        # Swap every other level role for the new one in a single edit, creating the role if needed
+        role = guild.get_role(self.level_roles.role_id(guild, level_index) or 0)
+        try:
+            if role is None:
+                role = await with_retry(lambda: guild.create_role(name=new_level_name))
+                self.level_roles.add(role)
+            level_role_ids = self.level_roles.role_ids(guild)
+            roles = [r for r in member.roles if r.id not in level_role_ids and not r.is_default()]
+            roles.append(role)
+            await with_retry(lambda: member.edit(roles=roles, reason="Level up"))
+        except discord.Forbidden:
+            print(f"Missing permissions to update level role {new_level_name} for {member}")
+
+        # Announcements are coalesced per guild so bursts become a single post
+        await self.level_up_announcer.add(guild.id, (member, new_level_name))
+
+    async def announce_level_up(self, guild_id, level_up):
+        member, level_name = level_up
+        await self.send_level_up(member.guild, f"🎉 {member.mention} leveled up to **{level_name}**!")
+
+    async def announce_level_ups(self, guild_id, level_ups):
+        guild = self.bot.get_guild(guild_id)
+        if guild is None:
+            return
+        lines = [f"🎉 {member.mention} → **{level_name}**" for member, level_name in level_ups]
+
+        # Embed descriptions cap at 4096 characters and a message holds at most 10 embeds
+        embeds, chunk = [], ""
+        for line in lines:
+            if len(chunk) + len(line) + 1 > 4000:
+                embeds.append(chunk)
+                chunk = ""
+            chunk += line + "\n"
+        embeds.append(chunk)
+        embeds = [discord.Embed(title=f"🏆 {len(level_ups)} members ranked up!" if index == 0 else None,
+                                description=description, color=discord.Color.gold())
+                  for index, description in enumerate(embeds)]
+        for start in range(0, len(embeds), 10):
+            await self.send_level_up(guild, embeds=embeds[start:start + 10])
+
+    async def send_level_up(self, guild, content=None, embeds=None):
+        """Post to the level-up channel, falling back to a mod-log warning if we can't."""
+        ranks_channel = self.get_level_up_channel(guild)
+        if not ranks_channel:
+            print(f"Channel {self.level_up_channel_name} does not exist.")
+            return
+        try:
+            await with_retry(lambda: ranks_channel.send(content, embeds=embeds or []))
+        except discord.Forbidden:
+            print(f"Missing permissions to send message to {self.level_up_channel_name}")
+            mod_log_channel = discord.utils.get(guild.text_channels, name=MOD_LOG_CHANNEL)
+            if mod_log_channel:
+                await mod_log_channel.send(f"⚠️ Unable to send level-up announcements to {self.level_up_channel_name}.")
 
     @commands.command(name="rank")
-    async def rank(self, ctx, member: discord.Member = None):
-        """Shows the rank and XP of a user."""
+    async def rank(self, ctx, member: typing.Optional[discord.Member] = None, season: str = None):
+        """Shows the rank and XP of a user (optionally for a season: `current` or YYYY-MM)."""
 
         # ✅ Delete the original command message
         try:
@@ -241,98 +475,258 @@ class RankCog(commands.Cog):
         if not member:
             member = ctx.author
 
-        guild_id = str(ctx.guild.id)
-        user_id = str(member.id)
+        guild_id = ctx.guild.id
+        user_id = member.id
 
-        data = self.load_data()
-        if guild_id not in data or user_id not in data[guild_id]:
-            await ctx.send(f"{member.display_name} has no XP recorded yet.")
+        season_key = self.resolve_season(season)
+        if season_key is False:
+            await ctx.send(f"❌ Unknown season. Try `current` or one of: {', '.join(self.store.seasons()[:6])}")
             return
 
-        user_data = data[guild_id][user_id]
-        xp = user_data["xp"]
-        level_index = user_data["level"]
-        level_name = LEVELS[level_index][1]
+        user_data = self.store.get(guild_id, user_id)
+        if user_data is None:
+            await ctx.send(f"{member.display_name} has no XP recorded yet.")
+            return
 
-        # Compute leaderboard rank
-        guild_data = data[guild_id]
-        sorted_users = sorted(guild_data.items(), key=lambda item: item[1]["xp"], reverse=True)
-        rank_position = next((idx for idx, item in enumerate(sorted_users, start=1) if item[0] == user_id), None)
+        xp = user_data.xp
+        level_index = user_data.level
+        level_name = LEVELS.names[level_index]
+
+        # Lifetime ranks get an image card when Pillow is installed; seasons and failures use the embed
+        if not season_key and rank_card.AVAILABLE:
+            position = self.store.leaderboard(guild_id).position(user_id)
+            try:
+                png = await self.render_rank_card(member, user_data, position)
+            except Exception as e:
+                print(f"⚠️ Failed to render rank card for {member}: {e}")
+            else:
+                await ctx.send(file=discord.File(io.BytesIO(png), filename="rank.png"))
+                return
 
         embed = discord.Embed(title=f"{member.display_name}'s Rank",
                               color=discord.Color.blue())
         embed.add_field(name="Level", value=f"{level_index} - {level_name}", inline=False)
         embed.add_field(name="XP", value=str(xp), inline=False)
+
+        if season_key:
+            # Season scores decay while a member is idle; reading the score settles it
+            score = self.store.season_score(guild_id, user_id, season_key)
+            embed.add_field(name=f"Season {season_key} XP", value=str(score.xp if score else 0), inline=False)
+
+        # Look up leaderboard rank and neighbours from the index
+        board = self.store.leaderboard(guild_id, season_key)
+        rank_position = board.position(user_id)
+        nearby = board.around(user_id, radius=2)
+
         if rank_position:
-            embed.add_field(name="Leaderboard Position", value=f"#{rank_position}", inline=False)
+            label = f"Season {season_key} Position" if season_key else "Leaderboard Position"
+            embed.add_field(name=label, value=f"#{rank_position}", inline=False)
+        if len(nearby) > 1:
+            lines = []
+            for position, other_id, other_xp in nearby:
+                other = ctx.guild.get_member(other_id)
+                name = other.display_name if other else "Unknown member"
+                marker = "➡️ " if other_id == user_id else ""
+                lines.append(f"{marker}#{position} - {name} ({other_xp} XP)")
+            embed.add_field(name="Nearby", value="\n".join(lines), inline=False)
 
         await ctx.send(embed=embed)
 
-    @commands.command(name="leaderboard")
-    async def leaderboard(self, ctx, page: int = 1):
-        """Shows the XP leaderboard for this server with pagination (interactive buttons)."""
+    async def render_rank_card(self, member, user_data, position):
+        """Return a member's rank card as PNG bytes, reusing a cached render when nothing on it changed."""
+        avatar = member.display_avatar.replace(size=256, format="png")
+        key = (member.guild.id, member.id, user_data.xp, user_data.level, avatar.key, position, member.display_name)
+        png = self.rank_cards.cached(key)
+        if png is not None:
+            return png
+
+        try:
+            avatar_bytes = await avatar.read()
+        except discord.HTTPException:
+            avatar_bytes = None
+        level_index = user_data.level
+        card = {
+            "name": member.display_name,
+            "level": level_index,
+            "level_name": LEVELS.names[level_index],
+            "xp": user_data.xp,
+            "floor": LEVELS.thresholds[level_index],
+            "next": LEVELS.thresholds[level_index + 1] if level_index + 1 < len(LEVELS.thresholds) else None,
+            "position": position,
+            "avatar": avatar_bytes,
+        }
+        return await self.rank_cards.render(key, card)
+
+    def resolve_season(self, season):
+        """Map a season argument to a season key: None for lifetime, False if unknown."""
+        if season is None:
+            return None
+        if season.lower() in ("current", "season", "now"):
+            return self.store.season_key
+        return season if season in self.store.seasons() else False
+
+    @commands.command(name="backfillxp")
+    @commands.has_permissions(administrator=True)
+    async def backfillxp(self, ctx):
+        """Rebuild XP from channel history (resumable; rerun to continue an interrupted crawl)."""
+        task = self.backfill_tasks.get(ctx.guild.id)
+        if task and not task.done():
+            await ctx.send("⏳ A backfill is already running for this server.")
+            return
+        self.backfill_tasks[ctx.guild.id] = asyncio.create_task(self.run_backfill(ctx))
 
-        guild_id = str(ctx.guild.id)
-        data = self.load_data()
+    async def run_backfill(self, ctx):
+        guild = ctx.guild
+        status = await ctx.send("📜 Crawling channel history for XP…")
+        backfill = HistoryBackfill(guild, os.path.join(BACKFILL_STATE_DIR, f"{guild.id}.json"), XP_PREFIX)
+        started = time.monotonic()
 
-        if guild_id not in data or not data[guild_id]:
-            await ctx.send("No XP data available for this server yet.")
+        async def report(scanned, users):
+            await status.edit(content=f"📜 Crawling channel history… {scanned:,} messages scanned, {users:,} members found.")
+
+        try:
+            totals = await backfill.run(on_progress=report)
+        except Exception as e:
+            await status.edit(content=f"❌ Backfill stopped: {e}. Run `backfillxp` again to resume.")
             return
 
-        guild_data = data[guild_id]
+        # Commit everything in one batch, then let role sync catch members up to their new levels
+        changed = self.store.bulk_merge(guild.id, totals, LEVELS.level_for)
+        await self.store.flush()
+        backfill.clear_checkpoint()
+        if not (self.role_sync_task and not self.role_sync_task.done()):
+            self.role_sync_task = asyncio.create_task(self.reconcile_roles())
 
-        # Sort users by XP descending
-        sorted_users = sorted(guild_data.items(), key=lambda item: item[1]["xp"], reverse=True)
+        await status.edit(content=f"✅ Backfill complete: {backfill.scanned:,} messages scanned, "
+                                  f"{changed:,} members updated in {time.monotonic() - started:.0f}s.")
 
-        # Pagination (10 entries per page)
-        start_index = (page - 1) * 10
-        end_index = start_index + 10
-        users_to_show = sorted_users[start_index:end_index]
+    @backfillxp.error
+    async def backfillxp_error(self, ctx, error):
+        if isinstance(error, commands.MissingPermissions):
+            await ctx.send("🚫 You need to be an administrator to run a backfill.")
 
-        if not users_to_show:
+    @commands.command(name="leaderboard")
+    async def leaderboard(self, ctx, page: typing.Optional[int] = 1, season: str = None):
+        """Shows the XP leaderboard for this server with pagination (optionally for a season, e.g. `!leaderboard current`)."""
+
+        season_key = self.resolve_season(season)
+        if season_key is False:
+            await ctx.send(f"❌ Unknown season. Try `current` or one of: {', '.join(self.store.seasons()[:6])}")
+            return
+
+        if not self.store.leaderboard(ctx.guild.id, season_key):
+            await ctx.send("No XP data available for this server yet.")
+            return
+
+        embed = self.leaderboard_page(ctx.guild, page, season_key) if page >= 1 else None
+        if embed is None:
             await ctx.send(f"No users found on page {page}.")
             return
 
-        embed = discord.Embed(title=f"{ctx.guild.name} XP Leaderboard (Page {page})",
+        view = LeaderboardView(self, ctx.guild, page, season_key)
+        await ctx.send(embed=embed, view=view)
+
+    def leaderboard_page(self, guild, page, season=None):
+        """Return the embed for one leaderboard page, rendering and caching it on first request."""
+        board_key = (guild.id, season)
+        embed = self.leaderboard_pages.get(board_key, page)
+        if embed is not None:
+            return embed
+
+        # Pagination (10 entries per page), sliced straight out of the leaderboard index
+        board = self.store.leaderboard(guild.id, season)
+        users_to_show = board.page(page, per_page=LEADERBOARD_PAGE_SIZE)
+        if season == self.store.season_key:
+            # Settle decay for the members about to be shown; if anyone drops, re-slice the page
+            for _ in range(3):
+                if not self.store.settle_decay(guild.id, [user_id for _, user_id, _ in users_to_show]):
+                    break
+                users_to_show = board.page(page, per_page=LEADERBOARD_PAGE_SIZE)
+        if not users_to_show:
+            return None
+
+        title = f"{guild.name} Season {season} Leaderboard" if season else f"{guild.name} XP Leaderboard"
+        embed = discord.Embed(title=f"{title} (Page {page})",
                               color=discord.Color.gold())
 
         # Show users for the current page
-        for rank, (user_id, user_data) in enumerate(users_to_show, start=start_index + 1):
-            member = ctx.guild.get_member(int(user_id))
-            if member:
+        guild_data = self.store.guild(guild.id)
+        for rank, user_id, board_xp in users_to_show:
+            user_data = guild_data.get(user_id)
+            member = guild.get_member(user_id)
+            if member and user_data:
+                xp_text = f"Season XP: {board_xp}" if season else f"XP: {user_data.xp}"
                 embed.add_field(name=f"#{rank} - {member.display_name}",
-                                value=f"Level {user_data['level']} - {LEVELS[user_data['level']][1]} | XP: {user_data['xp']}",
+                                value=f"Level {user_data.level} - {LEVELS.names[user_data.level]} | {xp_text}",
                                 inline=False)
 
-        # Buttons for pagination
-        class PaginationView(View):
-            def __init__(self, page, total_pages):
-                super().__init__()
-                self.page = page
-                self.total_pages = total_pages
+        self.leaderboard_pages.put(board_key, page, embed)
+        return embed
 
-            @discord.ui.button(label="Previous", style=discord.ButtonStyle.primary)
-            async def previous_button(self, button: discord.ui.Button, interaction: discord.Interaction):
-                if self.page > 1:
-                    self.page -= 1
-                    await self.update_page(interaction)
 
-            @discord.ui.button(label="Next", style=discord.ButtonStyle.primary)
-            async def next_button(self, button: discord.ui.Button, interaction: discord.Interaction):
-                if self.page < self.total_pages:
-                    self.page += 1
-                    await self.update_page(interaction)
+class LeaderboardPages:
+    """Rendered leaderboard embeds cached per leaderboard and page.
 
-            async def update_page(self, interaction):
-                # Update embed message for the new page
-                await interaction.response.edit_message(embed=embed, view=self)
+    Leaderboards are keyed by ``(guild_id, season)``. A page is only dropped when
+    an XP change moves entries within its slice.
+    """
 
-        total_pages = (len(sorted_users) // 10) + (1 if len(sorted_users) % 10 else 0)
+    def __init__(self, per_page):
+        self.per_page = per_page
+        self._pages = {}
 
-        view = PaginationView(page, total_pages)
+    def get(self, board_key, page):
+        return self._pages.get(board_key, {}).get(page)
 
-        # Send the embed message with pagination buttons
-        await ctx.send(embed=embed, view=view)
+    def put(self, board_key, page, embed):
+        self._pages.setdefault(board_key, {})[page] = embed
+
+    def invalidate(self, board_key, first, last):
+        """Drop the cached pages covering 0-based positions first..last."""
+        pages = self._pages.get(board_key)
+        if not pages:
+            return
+        for page in range(first // self.per_page + 1, last // self.per_page + 2):
+            pages.pop(page, None)
+
+
+class LeaderboardView(discord.ui.View):
+    """Previous/Next buttons for a leaderboard message."""
+
+    def __init__(self, cog, guild, page, season=None):
+        super().__init__(timeout=180)
+        self.cog = cog
+        self.guild = guild
+        self.page = page
+        self.season = season
+        self.update_buttons()
+
+    def total_pages(self):
+        return self.cog.store.leaderboard(self.guild.id, self.season).total_pages(per_page=LEADERBOARD_PAGE_SIZE)
+
+    def update_buttons(self):
+        self.previous_button.disabled = self.page <= 1
+        self.next_button.disabled = self.page >= self.total_pages()
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.primary)
+    async def previous_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self.page > 1:
+            self.page -= 1
+        await self.update_page(interaction)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.primary)
+    async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await self.update_page(interaction)
+
+    async def update_page(self, interaction):
+        embed = self.cog.leaderboard_page(self.guild, self.page, self.season)
+        if embed is None:
+            # The leaderboard shrank under us; stay on the last page that exists
+            self.page = max(1, self.total_pages())
+            embed = self.cog.leaderboard_page(self.guild, self.page, self.season)
+        self.update_buttons()
+        await interaction.response.edit_message(embed=embed, view=self)
 
 async def setup(bot):
     await bot.add_cog(RankCog(bot))
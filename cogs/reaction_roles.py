@@ -2,9 +2,12 @@ import discord
 from discord.ext import commands
 import json
 import os
+import re
 
 REACTION_ROLES_FILE = "reaction_roles.json"
 
+_CUSTOM_EMOJI = re.compile(r"<a?:\w+:(\d+)>")
+
 
 def load_reaction_roles():
     if os.path.exists(REACTION_ROLES_FILE):
@@ -18,6 +21,26 @@ def save_reaction_roles(data):
         json.dump(data, f, indent=4)
 
 
+def emoji_key(emoji):
+    """Custom emojis are keyed by ID (so renames don't matter), unicode emojis by the emoji itself."""
+    if isinstance(emoji, str):
+        match = _CUSTOM_EMOJI.fullmatch(emoji.strip())
+        return int(match.group(1)) if match else emoji.strip()
+    return emoji.id or emoji.name
+
+
+def build_index(reaction_roles):
+    """Compile the saved config into {(message_id, emoji key): (role_id, multi_select, the set's other role IDs)}."""
+    index = {}
+    for msg_id, rr_data in reaction_roles.items():
+        emoji_role_map = rr_data["emoji_role_map"]
+        multi_select = rr_data.get("multi_select", False)
+        set_roles = frozenset(int(role_id) for role_id in emoji_role_map.values())
+        for emoji, role_id in emoji_role_map.items():
+            index[(int(msg_id), emoji_key(emoji))] = (int(role_id), multi_select, set_roles - {int(role_id)})
+    return index
+
+
 async def ensure_role_exists(guild, role_name):
     """Ensure the role exists, create it if it doesn't."""
     role = discord.utils.get(guild.roles, name=role_name)
@@ -42,6 +65,7 @@ class ReactionRoles(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.reaction_roles = load_reaction_roles()
+        self.index = build_index(self.reaction_roles)
         print("[ReactionRoles] Cog loaded.")
 
     def is_mod_or_apex():
@@ -125,6 +149,7 @@ class ReactionRoles(commands.Cog):
             "multi_select": multi_select
         }
         save_reaction_roles(self.reaction_roles)
+        self.index = build_index(self.reaction_roles)
 
         # User feedback: Whisper the user
         try:
@@ -141,23 +166,15 @@ class ReactionRoles(commands.Cog):
         if payload.user_id == self.bot.user.id:
             return
 
-        msg_id = str(payload.message_id)
-        if msg_id not in self.reaction_roles:
+        entry = self.index.get((payload.message_id, emoji_key(payload.emoji)))
+        if entry is None:
             return
 
         guild = self.bot.get_guild(payload.guild_id)
         if guild is None:
             return
 
-        emoji = str(payload.emoji)
-        rr_data = self.reaction_roles[msg_id]
-        emoji_role_map = rr_data["emoji_role_map"]
-        multi_select = rr_data.get("multi_select", False)
-
-        if emoji not in emoji_role_map:
-            return
-
-        role_id = emoji_role_map[emoji]
+        role_id, multi_select, other_roles = entry
         role = guild.get_role(role_id)
         member = guild.get_member(payload.user_id)
         if member is None or role is None:
@@ -165,12 +182,13 @@ class ReactionRoles(commands.Cog):
 
         # If not multi select, remove other roles from this reaction role set
         if not multi_select:
-            for e, r_id in emoji_role_map.items():
-                if r_id != role_id and r_id in [r.id for r in member.roles]:
-                    try:
-                        await member.remove_roles(guild.get_role(r_id))
-                    except Exception:
-                        pass
+            held = other_roles.intersection(r.id for r in member.roles)
+            others = [r for r in map(guild.get_role, held) if r is not None]
+            if others:
+                try:
+                    await member.remove_roles(*others)
+                except Exception:
+                    pass
 
         try:
             await member.add_roles(role)
@@ -189,22 +207,15 @@ class ReactionRoles(commands.Cog):
         if payload.user_id == self.bot.user.id:
             return
 
-        msg_id = str(payload.message_id)
-        if msg_id not in self.reaction_roles:
+        entry = self.index.get((payload.message_id, emoji_key(payload.emoji)))
+        if entry is None:
             return
 
         guild = self.bot.get_guild(payload.guild_id)
         if guild is None:
             return
 
-        emoji = str(payload.emoji)
-        rr_data = self.reaction_roles[msg_id]
-        emoji_role_map = rr_data["emoji_role_map"]
-
-        if emoji not in emoji_role_map:
-            return
-
-        role_id = emoji_role_map[emoji]
+        role_id = entry[0]
         role = guild.get_role(role_id)
         member = guild.get_member(payload.user_id)
         if member is None or role is None:
@@ -1,113 +1,362 @@
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord.ext.commands import has_permissions, MissingPermissions
+import asyncio
+import os
 import re
-from datetime import datetime, timedelta
+import time
+import typing
+from dotenv import load_dotenv
+from core.filters import FilterEngine
+from core.flood import FloodDetector
+from core.modlog import AuditLog, ModLogSink
+from core.bans import BanIndex
+from core.bulk import run_bounded, with_retry
+from core.pipeline import PRIORITY_MODERATION, PRIORITY_RATE_LIMIT, get_pipeline
+from core.purge import PurgeFilter, parse_age, purge_channel
+from core.raid import RaidDetector
+from core.scheduler import ExpiryScheduler
+
+load_dotenv()
+
+# Filter rules per guild (data/filters/<guild_id>.json, falling back to default.json); edits apply without a restart
+FILTERS_DIR = "data/filters"
+# Pending unmutes/unbans for timed mutes and bans, so they survive restarts
+MODERATION_SCHEDULE_FILE = "data/moderation_schedule.json"
+MUTE_SETUP_CONCURRENCY = int(os.getenv("MUTE_SETUP_CONCURRENCY", 3))
+# Mod-log lines are batched into embeds every few seconds; every action is also journaled to data/audit/
+MOD_LOG_CHANNEL = os.getenv("MOD_LOG_CHANNEL", "mod-log")
+MOD_LOG_FLUSH_SECONDS = float(os.getenv("MOD_LOG_FLUSH_SECONDS", 3))
+AUDIT_DIR = "data/audit"
+
+# Flood protection: N messages within T seconds from one member, or in one channel, triggers an action.
+# Member actions: delete, mute or log. Channel actions: slowmode, delete or log.
+FLOOD_USER_MESSAGES = int(os.getenv("FLOOD_USER_MESSAGES", 6))
+FLOOD_USER_SECONDS = float(os.getenv("FLOOD_USER_SECONDS", 5))
+FLOOD_USER_ACTION = os.getenv("FLOOD_USER_ACTION", "mute")
+FLOOD_MUTE_MINUTES = int(os.getenv("FLOOD_MUTE_MINUTES", 10))
+FLOOD_CHANNEL_MESSAGES = int(os.getenv("FLOOD_CHANNEL_MESSAGES", 25))
+FLOOD_CHANNEL_SECONDS = float(os.getenv("FLOOD_CHANNEL_SECONDS", 10))
+FLOOD_CHANNEL_ACTION = os.getenv("FLOOD_CHANNEL_ACTION", "slowmode")
+FLOOD_SLOWMODE_SECONDS = int(os.getenv("FLOOD_SLOWMODE_SECONDS", 10))
+FLOOD_SLOWMODE_MINUTES = float(os.getenv("FLOOD_SLOWMODE_MINUTES", 5))
+
+# Raid detection: more than RAID_USERS members posting near-identical text within RAID_WINDOW_SECONDS
+RAID_USERS = int(os.getenv("RAID_USERS", 4))
+RAID_WINDOW_SECONDS = float(os.getenv("RAID_WINDOW_SECONDS", 60))
+RAID_SIMILARITY = float(os.getenv("RAID_SIMILARITY", 0.7))
+RAID_MIN_LENGTH = int(os.getenv("RAID_MIN_LENGTH", 20))
+
+class PurgeFlags(commands.FlagConverter, case_insensitive=True):
+    """Filters for `!purge`, e.g. `user: @spammer regex: free nitro older: 2d channels: #general #memes dry: yes`."""
+    user: typing.Tuple[discord.User, ...] = commands.flag(aliases=["users", "author"], default=())
+    regex: typing.Optional[str] = None
+    attachments: typing.Optional[bool] = None
+    older: typing.Optional[str] = None
+    newer: typing.Optional[str] = None
+    channels: typing.Tuple[discord.TextChannel, ...] = commands.flag(aliases=["channel"], default=())
+    limit: typing.Optional[int] = None
+    scan: int = 5000
+    dry: bool = commands.flag(aliases=["dryrun"], default=False)
+
 
 class Utilities(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.muted_users = {}
-        self.banned_users = {}
-        self.check_timeouts.start()
+        self.expiries = ExpiryScheduler(MODERATION_SCHEDULE_FILE, self.expire)
+        self.expiries.load()
+        self.expiry_task = None
+        self.bans = BanIndex()
+        self.mute_role_locks = {}
+        self.mute_setup_tasks = {}
+        self.filters = FilterEngine(FILTERS_DIR)
+        self.user_flood = FloodDetector(FLOOD_USER_MESSAGES, FLOOD_USER_SECONDS)
+        self.channel_flood = FloodDetector(FLOOD_CHANNEL_MESSAGES, FLOOD_CHANNEL_SECONDS)
+        self.flood_slowmodes = {}
+        self.raids = RaidDetector(RAID_USERS, RAID_WINDOW_SECONDS, RAID_SIMILARITY, RAID_MIN_LENGTH)
+        self.mod_log = ModLogSink(bot, MOD_LOG_CHANNEL, AuditLog(AUDIT_DIR), MOD_LOG_FLUSH_SECONDS)
 
     print("[Utilities] Cog loaded.")
 
-    @tasks.loop(minutes=1)
-    async def check_timeouts(self):
-        now = datetime.utcnow()
-        for user_id, (guild_id, unmute_time) in list(self.muted_users.items()):
-            if now >= unmute_time:
-                guild = self.bot.get_guild(guild_id)
-                member = guild.get_member(user_id)
-                mute_role = discord.utils.get(guild.roles, name="Muted")
-                if member and mute_role in member.roles:
-                    await member.remove_roles(mute_role)
-                    self.muted_users.pop(user_id)
-
-        for user_id, (guild_id, unban_time) in list(self.banned_users.items()):
-            if now >= unban_time:
-                guild = self.bot.get_guild(guild_id)
-                banned_users = await guild.bans()
-                for ban_entry in banned_users:
-                    if ban_entry.user.id == user_id:
-                        await guild.unban(ban_entry.user)
-                        self.banned_users.pop(user_id)
-                        break
-
-    async def log_action(self, ctx, message):
-        log_channel = discord.utils.get(ctx.guild.text_channels, name="mod-log")
-        if log_channel:
-            await log_channel.send(message)
+    async def cog_load(self):
+        get_pipeline(self.bot).register("flood", self.check_flood, PRIORITY_RATE_LIMIT)
+        get_pipeline(self.bot).register("raid", self.check_raid, PRIORITY_RATE_LIMIT)
+        get_pipeline(self.bot).register("filters", self.filter_message, PRIORITY_MODERATION)
+        self.expiry_task = asyncio.create_task(self.run_expiries())
+        self.mod_log.start()
+
+    async def cog_unload(self):
+        get_pipeline(self.bot).unregister("flood")
+        get_pipeline(self.bot).unregister("raid")
+        get_pipeline(self.bot).unregister("filters")
+        if self.expiry_task:
+            self.expiry_task.cancel()
+        for task in self.flood_slowmodes.values():
+            task.cancel()
+        for task in self.mute_setup_tasks.values():
+            task.cancel()
+        await self.mod_log.close()
+
+    async def run_expiries(self):
+        """Fire timed unmutes and unbans once the guild cache is ready, catching up on any that came due offline."""
+        await self.bot.wait_until_ready()
+        if len(self.expiries):
+            print(f"[Utilities] {len(self.expiries)} timed mutes/bans pending.")
+        await self.expiries.run()
+
+    async def expire(self, kind, guild_id, user_id):
+        """Undo a timed mute or ban. Members who left or were already pardoned are skipped."""
+        guild = self.bot.get_guild(guild_id)
+        if guild is None:
+            return
+
+        if kind == "unmute":
+            member = guild.get_member(user_id)
+            mute_role = discord.utils.get(guild.roles, name="Muted")
+            if member and mute_role in member.roles:
+                await with_retry(lambda: member.remove_roles(mute_role, reason="Timed mute expired"))
+                self.log_to_guild(guild, f"🔊 {member} unmuted (mute expired)", "unmute_expired", user=member)
+
+        elif kind == "unban":
+            # Once the ban list is indexed we know without a request whether they were already unbanned
+            if self.bans.is_banned(guild.id, user_id) is False:
+                return
+            name = self.bans.name_of(guild.id, user_id) or f"<@{user_id}>"
+            try:
+                await with_retry(lambda: guild.unban(discord.Object(id=user_id), reason="Timed ban expired"))
+            except discord.NotFound:
+                self.bans.remove(guild.id, user_id)
+                return
+            self.bans.remove(guild.id, user_id)
+            self.log_to_guild(guild, f"🛡️ Unbanned {name} ({user_id}) (ban expired)", "unban_expired", user=user_id)
+
+    def log_action(self, ctx, message, action, user=None, **details):
+        # ctx can be a command context or a message; both carry .guild, but only commands have a moderator
+        moderator = ctx.author if isinstance(ctx, commands.Context) else None
+        self.log_to_guild(ctx.guild, message, action, user=user, moderator=moderator, **details)
+
+    def log_to_guild(self, guild, message, action, user=None, moderator=None, **details):
+        """Queue a mod-log line; it is posted with the next batch and journaled to the audit log."""
+        self.mod_log.log(guild, message, action, user=user, moderator=moderator, **details)
 
     @commands.command()
     @has_permissions(kick_members=True)
     async def kick(self, ctx, member: discord.Member, *, reason=None):
         await member.kick(reason=reason)
         await ctx.send(f"👢 {member.mention} has been kicked. Reason: {reason}")
-        await self.log_action(ctx, f"👢 {member} kicked. Reason: {reason}")
+        self.log_action(ctx, f"👢 {member} kicked. Reason: {reason}", "kick", user=member, reason=reason)
 
     @commands.command()
     @has_permissions(ban_members=True)
     async def ban(self, ctx, member: discord.Member, duration: int = 0, *, reason=None):
         await member.ban(reason=reason)
         await ctx.send(f"🔨 {member.mention} has been banned. Reason: {reason}")
-        await self.log_action(ctx, f"🔨 {member} banned. Reason: {reason}")
+        self.log_action(ctx, f"🔨 {member} banned. Reason: {reason}", "ban", user=member, reason=reason, minutes=duration)
         if duration > 0:
-            self.banned_users[member.id] = (ctx.guild.id, datetime.utcnow() + timedelta(minutes=duration))
+            await self.expiries.schedule("unban", ctx.guild.id, member.id, time.time() + duration * 60)
 
     @commands.command()
     @has_permissions(ban_members=True)
     async def unban(self, ctx, *, member_name):
-        banned_users = await ctx.guild.bans()
-        name, discriminator = member_name.split("#")
-        for ban_entry in banned_users:
-            user = ban_entry.user
-            if user.name == name and user.discriminator == discriminator:
-                await ctx.guild.unban(user)
-                await ctx.send(f"🛡️ Unbanned {user.mention}")
-                await self.log_action(ctx, f"🛡️ Unbanned {user}")
-                return
-        await ctx.send("❌ User not found.")
+        """Unban a user by ID, mention, username or legacy name#1234."""
+        await self.bans.ensure(ctx.guild)
+        matches = self.bans.resolve(ctx.guild.id, member_name)
+        if len(matches) > 1:
+            options = ", ".join(f"{self.bans.name_of(ctx.guild.id, user_id)} ({user_id})" for user_id in matches[:10])
+            await ctx.send(f"⚠️ More than one banned user matches that name: {options}. Unban by ID instead.")
+            return
+        if not matches:
+            await ctx.send("❌ User not found.")
+            return
+
+        user_id = matches[0]
+        name = self.bans.name_of(ctx.guild.id, user_id)
+        try:
+            await ctx.guild.unban(discord.Object(id=user_id))
+        except discord.NotFound:
+            self.bans.remove(ctx.guild.id, user_id)
+            await ctx.send("❌ User not found.")
+            return
+        self.bans.remove(ctx.guild.id, user_id)
+        await self.expiries.cancel("unban", ctx.guild.id, user_id)
+        await ctx.send(f"🛡️ Unbanned <@{user_id}>")
+        self.log_action(ctx, f"🛡️ Unbanned {name} ({user_id})", "unban", user=user_id)
+
+    @commands.Cog.listener()
+    async def on_member_ban(self, guild, user):
+        self.bans.add(guild.id, user)
+
+    @commands.Cog.listener()
+    async def on_member_unban(self, guild, user):
+        self.bans.remove(guild.id, user.id)
 
     @commands.command()
     @has_permissions(manage_roles=True)
     async def mute(self, ctx, member: discord.Member, duration: int = 0, *, reason=None):
-        mute_role = discord.utils.get(ctx.guild.roles, name="Muted")
-        if not mute_role:
-            mute_role = await ctx.guild.create_role(name="Muted")
-            for channel in ctx.guild.channels:
-                await channel.set_permissions(mute_role, speak=False, send_messages=False)
-        await member.add_roles(mute_role)
+        await self.mute_member(member, duration, reason)
         await ctx.send(f"🔇 {member.mention} has been muted. Reason: {reason}")
-        await self.log_action(ctx, f"🔇 {member} muted. Reason: {reason}")
+        self.log_action(ctx, f"🔇 {member} muted. Reason: {reason}", "mute", user=member, reason=reason, minutes=duration)
+
+    async def mute_member(self, member, duration=0, reason=None):
+        """Give a member the Muted role (creating it if needed), optionally for ``duration`` minutes."""
+        guild = member.guild
+        mute_role = await self.get_mute_role(guild)
+        await member.add_roles(mute_role, reason=reason)
         if duration > 0:
-            self.muted_users[member.id] = (ctx.guild.id, datetime.utcnow() + timedelta(minutes=duration))
+            await self.expiries.schedule("unmute", guild.id, member.id, time.time() + duration * 60)
+
+    async def get_mute_role(self, guild):
+        """Return the guild's Muted role. A new role is returned straight away; its channel overwrites follow in the background."""
+        lock = self.mute_role_locks.setdefault(guild.id, asyncio.Lock())
+        async with lock:
+            mute_role = discord.utils.get(guild.roles, name="Muted")
+            if not mute_role:
+                mute_role = await guild.create_role(name="Muted", reason="Mute role setup")
+                self.start_mute_setup(guild, mute_role)
+        return mute_role
+
+    def start_mute_setup(self, guild, mute_role):
+        task = self.mute_setup_tasks.get(guild.id)
+        if task and not task.done():
+            return False
+        self.mute_setup_tasks[guild.id] = asyncio.create_task(self.apply_mute_overwrites(guild, mute_role))
+        return True
+
+    async def apply_mute_overwrites(self, guild, mute_role):
+        """Deny sending and speaking to the Muted role in every channel that doesn't already, a few channels at a time."""
+        def needs_overwrite(channel):
+            overwrite = channel.overwrites_for(mute_role)
+            return not (overwrite.send_messages is False and overwrite.speak is False)
+
+        pending = [channel for channel in guild.channels if needs_overwrite(channel)]
+        if not pending:
+            return
+        # Progress is edited into one message, so this goes to the channel directly rather than through the batch
+        log_channel = self.mod_log.channel_for(guild)
+        status = await log_channel.send(f"🔧 Setting up the Muted role in {len(pending)} channels…") if log_channel else None
+
+        async def apply(channel):
+            overwrite = channel.overwrites_for(mute_role)
+            overwrite.update(send_messages=False, speak=False)
+            await with_retry(lambda: channel.set_permissions(mute_role, overwrite=overwrite, reason="Mute role setup"))
+
+        async def report(done, failed):
+            if status:
+                await status.edit(content=f"🔧 Setting up the Muted role: {done}/{len(pending)} channels ({len(failed)} failed)…")
+
+        done, failed = await run_bounded(pending, apply, concurrency=MUTE_SETUP_CONCURRENCY, on_progress=report, progress_every=25)
+        summary = f"🔇 Muted role set up in {done - len(failed)}/{len(pending)} channels."
+        if failed:
+            summary += "\nFailed: " + ", ".join(f"#{channel} ({error})" for channel, error in failed[:10])
+        if status:
+            await status.edit(content=summary)
+        else:
+            print(f"[Utilities] {guild.name}: {summary}")
+        # Already in the status message above, so only journal it
+        self.mod_log.log(guild, summary, "mute_setup", post=False, channels=len(pending), failed=len(failed))
+
+    @commands.command(name="mutesetup")
+    @has_permissions(manage_roles=True)
+    async def mute_setup(self, ctx):
+        """Re-apply the Muted role's overwrites to any channel that is missing them."""
+        mute_role = await self.get_mute_role(ctx.guild)
+        if self.start_mute_setup(ctx.guild, mute_role):
+            await ctx.send("🔧 Checking Muted role overwrites; progress goes to the mod log.")
+        else:
+            await ctx.send("⏳ Muted role setup is already running.")
 
     @commands.command()
     @has_permissions(manage_roles=True)
     async def unmute(self, ctx, member: discord.Member):
         mute_role = discord.utils.get(ctx.guild.roles, name="Muted")
+        await self.expiries.cancel("unmute", ctx.guild.id, member.id)
         if mute_role in member.roles:
             await member.remove_roles(mute_role)
             await ctx.send(f"🔊 {member.mention} has been unmuted.")
-            await self.log_action(ctx, f"🔊 {member} unmuted")
+            self.log_action(ctx, f"🔊 {member} unmuted", "unmute", user=member)
         else:
             await ctx.send(f"❌ {member.mention} is not muted.")
 
     @commands.command(aliases=["purge"])
     @has_permissions(manage_messages=True)
-    async def clear(self, ctx, amount: int):
-        await ctx.channel.purge(limit=amount + 1)
-        await ctx.send(f"🧹 Cleared {amount} messages.", delete_after=5)
-        await self.log_action(ctx, f"🧹 Cleared {amount} messages in #{ctx.channel}")
+    async def clear(self, ctx, amount: typing.Optional[int] = None, *, flags: PurgeFlags):
+        """Delete the last N messages, or purge by author, regex, attachments and age across channels."""
+        filtered = flags.user or flags.regex or flags.attachments is not None or flags.older or flags.newer
+        if amount is None and flags.limit is None and not filtered:
+            await ctx.send("❌ Usage: `!clear <amount>` or `!purge user: @member regex: text older: 2d newer: 1h "
+                           "attachments: yes channels: #channel limit: 100 dry: yes` (at least one filter or `limit:`).")
+            return
+        if (amount is not None and amount <= 0) or (flags.limit is not None and flags.limit <= 0):
+            await ctx.send("❌ The number of messages to delete must be at least 1.")
+            return
+
+        try:
+            pattern = re.compile(flags.regex, re.IGNORECASE) if flags.regex else None
+            before = discord.utils.utcnow() - parse_age(flags.older) if flags.older else None
+            after = discord.utils.utcnow() - parse_age(flags.newer) if flags.newer else None
+        except (re.error, ValueError) as e:
+            await ctx.send(f"❌ {e}")
+            return
+
+        channels = flags.channels or (ctx.channel,)
+        denied = [channel for channel in channels if not channel.permissions_for(ctx.author).manage_messages]
+        if denied:
+            await ctx.send(f"🚫 You can't manage messages in {', '.join(channel.mention for channel in denied)}.")
+            return
+
+        # A bare `!clear N` deletes the last N messages, like before
+        limit = amount if amount is not None else flags.limit or 100
+        scan = amount if amount is not None and not (flags.user or pattern or flags.attachments is not None) else flags.scan
+        matches = PurgeFilter({user.id for user in flags.user}, pattern, flags.attachments, skip_ids={ctx.message.id})
+
+        verb = "Checking" if flags.dry else "Purging"
+        status = await ctx.send(f"🧹 {verb} {len(channels)} channel(s)…")
+        last_edit = 0
+
+        async def report(stats):
+            nonlocal last_edit
+            # Edits are throttled so progress reporting never competes with the deletes for rate limits
+            if time.monotonic() - last_edit < 3:
+                return
+            last_edit = time.monotonic()
+            await status.edit(content=f"🧹 {verb} {stats.channel.mention}: {stats.scanned:,} scanned, "
+                                      f"{stats.matched:,} matched, {stats.deleted:,} deleted…")
+
+        results = []
+        for channel in channels:
+            # Nothing at or after the command message in this channel, including our own status message
+            channel_before = before or (ctx.message if channel == ctx.channel else None)
+            results.append(await purge_channel(channel, matches, limit - sum(r.matched for r in results), scan,
+                                               before=channel_before, after=after, dry_run=flags.dry, on_progress=report))
+            if sum(r.matched for r in results) >= limit:
+                break
+
+        lines = [f"{r.channel.mention}: {r.matched:,} matched of {r.scanned:,} scanned"
+                 + ("" if flags.dry else f", {r.deleted:,} deleted ({r.bulk_deleted:,} bulk, {r.single_deleted:,} single)"
+                    + (f", {r.failed:,} failed" if r.failed else ""))
+                 for r in results]
+        if flags.dry:
+            samples = [message for r in results for message in r.sample][:5]
+            lines += [f"• {message.author}: {discord.utils.escape_mentions(message.content[:60])}" for message in samples]
+            await status.edit(content="🔍 Dry run, nothing deleted:\n" + "\n".join(lines))
+            return
+
+        try:
+            await ctx.message.delete()
+        except discord.HTTPException:
+            pass
+        deleted = sum(r.deleted for r in results)
+        await status.edit(content=f"🧹 Cleared {deleted} messages.\n" + "\n".join(lines), delete_after=10)
+        self.log_action(ctx, f"🧹 {ctx.author} purged {deleted} messages:\n" + "\n".join(lines), "purge",
+                        deleted=deleted, channels=[r.channel.id for r in results])
 
     @commands.command()
     @has_permissions(manage_channels=True)
     async def slowmode(self, ctx, seconds: int):
         await ctx.channel.edit(slowmode_delay=seconds)
         await ctx.send(f"🐌 Set slowmode to {seconds} seconds.")
-        await self.log_action(ctx, f"🐌 Set slowmode in #{ctx.channel} to {seconds} seconds")
+        self.log_action(ctx, f"🐌 Set slowmode in #{ctx.channel} to {seconds} seconds", "slowmode",
+                        channel=ctx.channel.id, seconds=seconds)
 
     @commands.command()
     @has_permissions(manage_channels=True)
@@ -116,7 +365,7 @@ class Utilities(commands.Cog):
         overwrite.send_messages = False
         await ctx.channel.set_permissions(ctx.guild.default_role, overwrite=overwrite)
         await ctx.send("🔒 Channel locked.")
-        await self.log_action(ctx, f"🔒 Locked #{ctx.channel}")
+        self.log_action(ctx, f"🔒 Locked #{ctx.channel}", "lock", channel=ctx.channel.id)
 
     @commands.command()
     @has_permissions(manage_channels=True)
@@ -125,7 +374,7 @@ class Utilities(commands.Cog):
         overwrite.send_messages = True
         await ctx.channel.set_permissions(ctx.guild.default_role, overwrite=overwrite)
         await ctx.send("🔓 Channel unlocked.")
-        await self.log_action(ctx, f"🔓 Unlocked #{ctx.channel}")
+        self.log_action(ctx, f"🔓 Unlocked #{ctx.channel}", "unlock", channel=ctx.channel.id)
 
     # Info commands
     @commands.command()
@@ -144,31 +393,167 @@ class Utilities(commands.Cog):
         await ctx.send(embed=discord.Embed(title=f"🌐 Server Info: {guild.name}", description=f"ID: {guild.id}\nMembers: {guild.member_count}\nRoles: {len(guild.roles)}\nChannels: {len(guild.channels)}", color=discord.Color.purple()))
 
     # Anti-spam and filters
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot:
+    async def filter_message(self, ctx):
+        """Message pipeline stage: one scan against every filter rule, then one action for the worst match."""
+        message = ctx.message
+        result = self.filters.scan(message.guild.id, ctx)
+        if result is None:
             return
 
-        # Anti-Invite
-        if re.search(r"(discord\.gg/|discord\.com/invite/)", message.content):
-            await message.delete()
-            await message.channel.send("🚫 Invite links are not allowed.", delete_after=5)
+        rule = result.rule
+        if result.action in ("delete", "mute"):
+            await ctx.delete(rule.notice)
+        if result.action == "mute" and isinstance(message.author, discord.Member):
+            try:
+                await self.mute_member(message.author, rule.mute_minutes, reason=f"Filter: {rule.name}")
+            except discord.Forbidden:
+                print(f"⚠️ Missing permissions to mute {message.author} in {message.guild.name}")
+
+        matched = ", ".join(f"{name} ({text})" for name, text in result.matches[:5])
+        self.log_action(message, f"🧹 Filter {result.action} for {message.author} in #{message.channel}: {matched}",
+                        "filter", user=message.author, rule=rule.name, result=result.action, channel=message.channel.id)
 
-        # Anti-token grabbers
-        if "grabify" in message.content or "iplogger" in message.content:
-            await message.delete()
-            await message.channel.send("🚫 Malicious links are not allowed.", delete_after=5)
+    async def check_flood(self, ctx):
+        """Message pipeline stage: rate limits per member and per channel, checked before content filters."""
+        message = ctx.message
+        now = message.created_at.timestamp()
 
-        # Anti-caps spam
-        if sum(1 for c in message.content if c.isupper()) > 15 and len(message.content) < 50:
-            await message.delete()
-            await message.channel.send("🚫 Too many capital letters. Please chill.", delete_after=5)
+        if self.user_flood.hit((message.guild.id, message.author.id), now):
+            await self.handle_user_flood(ctx)
+            if ctx.deleted:
+                return
+        if self.channel_flood.hit(message.channel.id, now):
+            await self.handle_channel_flood(ctx)
 
-        # Text filter (example words)
-        banned_words = ["badword1", "badword2"]
-        if any(word in message.content.lower() for word in banned_words):
-            await message.delete()
-            await message.channel.send("🚫 That word isn't allowed here.", delete_after=5)
+    async def handle_user_flood(self, ctx):
+        message = ctx.message
+        member = message.author
+        if FLOOD_USER_ACTION in ("delete", "mute"):
+            await ctx.delete()
+        if FLOOD_USER_ACTION == "mute" and isinstance(member, discord.Member):
+            # Muting ends the flood, so start counting afresh
+            self.user_flood.reset((message.guild.id, member.id))
+            try:
+                await self.mute_member(member, FLOOD_MUTE_MINUTES, reason="Message flood")
+            except discord.Forbidden:
+                print(f"⚠️ Missing permissions to mute {member} in {message.guild.name}")
+                return
+            await message.channel.send(f"🔇 {member.mention} has been muted for {FLOOD_MUTE_MINUTES} minutes for flooding.",
+                                       delete_after=10)
+            self.log_action(message, f"🌊 {member} muted for {FLOOD_MUTE_MINUTES} minutes: "
+                                     f"{FLOOD_USER_MESSAGES} messages in {FLOOD_USER_SECONDS:g}s in #{message.channel}",
+                            "flood", user=member, result="mute", channel=message.channel.id)
+        elif FLOOD_USER_ACTION == "log":
+            self.user_flood.reset((message.guild.id, member.id))
+            self.log_action(message, f"🌊 {member} is flooding #{message.channel}", "flood", user=member,
+                            result="log", channel=message.channel.id)
+
+    async def handle_channel_flood(self, ctx):
+        channel = ctx.message.channel
+        if FLOOD_CHANNEL_ACTION == "delete":
+            await ctx.delete()
+            return
+        self.channel_flood.reset(channel.id)
+        if FLOOD_CHANNEL_ACTION == "slowmode":
+            if channel.id in self.flood_slowmodes or not hasattr(channel, "slowmode_delay"):
+                return
+            if channel.slowmode_delay >= FLOOD_SLOWMODE_SECONDS:
+                return
+            previous = channel.slowmode_delay
+            try:
+                await channel.edit(slowmode_delay=FLOOD_SLOWMODE_SECONDS, reason="Message flood")
+            except discord.Forbidden:
+                print(f"⚠️ Missing permissions to set slowmode in #{channel}")
+                return
+            self.flood_slowmodes[channel.id] = asyncio.create_task(self.lift_flood_slowmode(channel, previous))
+            self.log_action(ctx.message, f"🐌 Flood in #{channel}: slowmode set to {FLOOD_SLOWMODE_SECONDS}s "
+                                         f"for {FLOOD_SLOWMODE_MINUTES:g} minutes",
+                            "flood", result="slowmode", channel=channel.id)
+        else:
+            self.log_action(ctx.message, f"🌊 #{channel} is being flooded", "flood", result="log", channel=channel.id)
+
+    async def lift_flood_slowmode(self, channel, previous):
+        """Restore a channel's slowmode once a flood has had time to die down."""
+        try:
+            await asyncio.sleep(FLOOD_SLOWMODE_MINUTES * 60)
+            await channel.edit(slowmode_delay=previous, reason="Flood slowmode expired")
+        except discord.HTTPException as e:
+            print(f"⚠️ Failed to restore slowmode in #{channel}: {e}")
+        finally:
+            self.flood_slowmodes.pop(channel.id, None)
+
+    async def check_raid(self, ctx):
+        """Message pipeline stage: catch many members posting the same (or nearly the same) text."""
+        message = ctx.message
+        hit = self.raids.check(message.guild.id, message.channel.id, message.id, message.author.id,
+                               ctx.content, message.created_at.timestamp())
+        if hit is None:
+            return
+        if not hit.new:
+            # A late copy of a raid we already cleaned up
+            await ctx.delete()
+            return
+
+        ctx.deleted = True
+        deleted = 0
+        by_channel = {}
+        for post in hit.posts:
+            by_channel.setdefault(post.channel_id, []).append(discord.Object(id=post.message_id))
+        for channel_id, messages in by_channel.items():
+            channel = message.guild.get_channel(channel_id)
+            if channel is None:
+                continue
+            for start in range(0, len(messages), 100):
+                batch = messages[start:start + 100]
+                try:
+                    await with_retry(lambda: channel.delete_messages(batch, reason="Raid: duplicate messages"))
+                    deleted += len(batch)
+                except discord.HTTPException as e:
+                    print(f"⚠️ Failed to bulk delete raid messages in #{channel}: {e}")
+
+        users = sorted({post.user_id for post in hit.posts})
+        channels = ", ".join(f"<#{channel_id}>" for channel_id in by_channel)
+        mentions = " ".join(f"<@{user_id}>" for user_id in users[:30])
+        self.log_action(message, f"🚨 Possible raid: {len(users)} members posted near-identical messages in {channels} "
+                                 f"within {RAID_WINDOW_SECONDS:g}s. Deleted {deleted} messages.\n"
+                                 f"Members: {mentions}\nSample: {discord.utils.escape_mentions(ctx.content[:200])}",
+                        "raid", members=users, deleted=deleted)
+
+    @commands.command(name="pipeline")
+    @has_permissions(manage_guild=True)
+    async def pipeline_stats(self, ctx):
+        """Shows how long each message pipeline stage takes."""
+        rows = get_pipeline(self.bot).report()
+        lines = [f"{'Stage':<12}{'Calls':>9}{'Avg ms':>9}{'Max ms':>9}{'Stops':>7}{'Errors':>7}"]
+        for name, calls, average, slowest, stops, errors in rows:
+            lines.append(f"{name[:11]:<12}{calls:>9}{average:>9.3f}{slowest:>9.2f}{stops:>7}{errors:>7}")
+        await ctx.send(embed=discord.Embed(title="📈 Message Pipeline", description="```\n" + "\n".join(lines) + "\n```",
+                                           color=discord.Color.blue()))
+
+    @commands.command(name="audit")
+    @has_permissions(view_audit_log=True)
+    async def audit(self, ctx, user: typing.Optional[discord.User] = None, action: typing.Optional[str] = None, limit: int = 10):
+        """Search the local moderation journal, e.g. `!audit @member`, `!audit mute 20` or `!audit @member ban`."""
+        if action and action.isdigit():
+            action, limit = None, int(action)
+        limit = max(1, min(limit, 25))
+        records = await self.mod_log.audit.query(ctx.guild.id, user_id=user.id if user else None,
+                                                 action=action.lower() if action else None, limit=limit)
+        if not records:
+            await ctx.send("📭 No matching actions in the audit log.")
+            return
+
+        lines = []
+        for record in records:
+            moderator = f" by <@{record['moderator']}>" if record.get("moderator") else ""
+            text = discord.utils.escape_mentions(record["text"].split("\n", 1)[0])[:150]
+            lines.append(f"<t:{int(record['ts'])}:R> **{record['action']}**{moderator}: {text}")
+        title = "📜 Audit Log" + (f": {user}" if user else "") + (f" ({action.lower()})" if action else "")
+        await ctx.send(embed=discord.Embed(title=title, description="\n".join(lines)[:4000], color=discord.Color.dark_grey()))
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.mod_log.forget(guild.id)
 
     @kick.error
     @ban.error
@@ -179,6 +564,9 @@ class Utilities(commands.Cog):
     @slowmode.error
     @lock.error
     @unlock.error
+    @mute_setup.error
+    @pipeline_stats.error
+    @audit.error
     async def permission_error(self, ctx, error):
         if isinstance(error, MissingPermissions):
             await ctx.send("🚫 You don't have permission to do that.")
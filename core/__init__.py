@@ -0,0 +1 @@
+"""Shared building blocks used by the cogs (storage, indexes, background workers)."""
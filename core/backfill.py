@@ -0,0 +1,124 @@
+import asyncio
+import heapq
+import json
+import os
+import time
+
+import discord
+
+from core.files import atomic_write_json
+from core.xp_rules import BACKFILL_XP_PER_GRANT, XP_COOLDOWN_SECONDS, earns_xp
+
+_DONE = object()
+
+
+class _Failed:
+    """Queue item standing in for an error that stopped a channel's producer."""
+
+    __slots__ = ("error",)
+
+    def __init__(self, error):
+        self.error = error
+
+
+class HistoryBackfill:
+    """Rebuild XP for one guild by crawling every text channel's history.
+
+    Each channel is streamed oldest-first by its own producer into a small bounded
+    queue, and the queues are merged by timestamp, so the 300-second cooldown is
+    applied in true chronological order across channels without holding more than
+    a few pages of messages in memory. Progress (per-channel last message and
+    per-user grant state) is checkpointed to ``state_path`` so an interrupted crawl
+    resumes where it stopped.
+    """
+
+    def __init__(self, guild, state_path, prefix, queue_size=200, checkpoint_every=5000):
+        self.guild = guild
+        self.state_path = state_path
+        self.prefix = prefix
+        self.queue_size = queue_size
+        self.checkpoint_every = checkpoint_every
+        self.state = self._load_state()
+        self.scanned = 0
+
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        # Only crawl messages sent before the backfill started; newer ones earn XP live
+        cutoff = discord.utils.time_snowflake(discord.utils.utcnow())
+        return {"cutoff": cutoff, "channels": {}, "users": {}}
+
+    async def _checkpoint(self):
+        await asyncio.to_thread(atomic_write_json, self.state_path, self.state)
+
+    def clear_checkpoint(self):
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+    async def _produce(self, channel, queue):
+        """Stream one channel's history into its queue as compact tuples."""
+        after = self.state["channels"].get(str(channel.id))
+        try:
+            async for message in channel.history(limit=None, oldest_first=True,
+                                                 after=discord.Object(after) if after else None,
+                                                 before=discord.Object(self.state["cutoff"])):
+                eligible = earns_xp(message, self.prefix)
+                await queue.put((message.created_at.timestamp(), message.id, message.author.id, eligible))
+        except discord.Forbidden:
+            print(f"[Backfill] No access to #{channel.name}, skipping.")
+        except Exception as e:
+            # Anything else must not look like the end of the channel, or it would be checkpointed as done
+            await queue.put(_Failed(e))
+            return
+        await queue.put(_DONE)
+
+    async def run(self, on_progress=None):
+        """Crawl all readable text channels and return ``{user_id: backfilled_xp}``."""
+        channels = [channel for channel in self.guild.text_channels
+                    if self.state["channels"].get(str(channel.id)) != "done"
+                    and channel.permissions_for(self.guild.me).read_message_history]
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in channels]
+        producers = [asyncio.create_task(self._produce(channel, queue)) for channel, queue in zip(channels, queues)]
+
+        users = self.state["users"]
+        heap = []
+        try:
+            for index, queue in enumerate(queues):
+                await self._advance(heap, index, queue, channels)
+
+            last_report = time.monotonic()
+            while heap:
+                timestamp, message_id, index, author_id, eligible = heapq.heappop(heap)
+                if eligible:
+                    grants, last_grant = users.get(str(author_id), (0, 0))
+                    if timestamp - last_grant >= XP_COOLDOWN_SECONDS:
+                        users[str(author_id)] = (grants + 1, timestamp)
+                self.state["channels"][str(channels[index].id)] = message_id
+                self.scanned += 1
+
+                if self.scanned % self.checkpoint_every == 0:
+                    await self._checkpoint()
+                if on_progress and time.monotonic() - last_report >= 10:
+                    last_report = time.monotonic()
+                    await on_progress(self.scanned, len(users))
+
+                await self._advance(heap, index, queues[index], channels)
+        finally:
+            for producer in producers:
+                producer.cancel()
+            await self._checkpoint()
+
+        return {user_id: grants * BACKFILL_XP_PER_GRANT for user_id, (grants, _) in users.items()}
+
+    async def _advance(self, heap, index, queue, channels):
+        """Push the next message from channel ``index`` onto the merge heap."""
+        item = await queue.get()
+        if isinstance(item, _Failed):
+            # Fails the run; the checkpoint keeps this channel's last merged message so a rerun resumes there
+            raise item.error
+        if item is _DONE:
+            self.state["channels"][str(channels[index].id)] = "done"
+            return
+        timestamp, message_id, author_id, eligible = item
+        heapq.heappush(heap, (timestamp, message_id, index, author_id, eligible))
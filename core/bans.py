@@ -0,0 +1,90 @@
+import asyncio
+import re
+
+_MENTION = re.compile(r"<@!?(\d+)>")
+
+
+def _name_keys(user):
+    """Lowercased names a banned user can be looked up by: username, plus name#1234 for legacy accounts."""
+    keys = {user.name.lower()}
+    if getattr(user, "discriminator", "0") not in ("0", "0000"):
+        keys.add(f"{user.name}#{user.discriminator}".lower())
+    return keys
+
+
+class BanIndex:
+    """Per-guild ban list indexed by user ID and by lowercased username.
+
+    Each guild's list is fetched once, on first use, and then kept current from
+    ban/unban events, so lookups never need a REST call.
+    """
+
+    def __init__(self):
+        self._names = {}  # guild_id -> {user_id: (display name, name keys)}
+        self._by_name = {}  # guild_id -> {name: {user_id, ...}}
+        self._loading = {}
+
+    async def ensure(self, guild):
+        """Load the guild's ban list if it hasn't been yet; concurrent callers share one fetch."""
+        if guild.id in self._names:
+            return
+        task = self._loading.get(guild.id)
+        if task is None:
+            task = self._loading[guild.id] = asyncio.create_task(self._load(guild))
+        try:
+            await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._loading.pop(guild.id, None)
+
+    async def _load(self, guild):
+        names, by_name = {}, {}
+        async for entry in guild.bans(limit=None):
+            keys = _name_keys(entry.user)
+            names[entry.user.id] = (str(entry.user), keys)
+            for key in keys:
+                by_name.setdefault(key, set()).add(entry.user.id)
+        self._names[guild.id] = names
+        self._by_name[guild.id] = by_name
+        print(f"[Bans] Indexed {len(names)} bans in {guild.name}.")
+
+    def add(self, guild_id, user):
+        names = self._names.get(guild_id)
+        if names is None:
+            return  # Not loaded yet; the first load will include this ban
+        self.remove(guild_id, user.id)
+        keys = _name_keys(user)
+        names[user.id] = (str(user), keys)
+        for key in keys:
+            self._by_name[guild_id].setdefault(key, set()).add(user.id)
+
+    def remove(self, guild_id, user_id):
+        names = self._names.get(guild_id)
+        entry = names.pop(user_id, None) if names is not None else None
+        if entry is None:
+            return
+        by_name = self._by_name[guild_id]
+        for key in entry[1]:
+            ids = by_name.get(key)
+            if ids is not None:
+                ids.discard(user_id)
+                if not ids:
+                    del by_name[key]
+
+    def is_banned(self, guild_id, user_id):
+        """True/False once the guild is indexed, None if it isn't yet."""
+        names = self._names.get(guild_id)
+        return None if names is None else user_id in names
+
+    def name_of(self, guild_id, user_id):
+        entry = self._names.get(guild_id, {}).get(user_id)
+        return entry[0] if entry else None
+
+    def resolve(self, guild_id, query):
+        """Return the banned user IDs matching an ID, mention, username or legacy name#1234."""
+        query = query.strip()
+        mention = _MENTION.fullmatch(query)
+        if mention or query.isdigit():
+            user_id = int(mention.group(1) if mention else query)
+            return [user_id] if user_id in self._names.get(guild_id, {}) else []
+        return sorted(self._by_name.get(guild_id, {}).get(query.lstrip("@").lower(), ()))
@@ -0,0 +1,55 @@
+import asyncio
+import random
+
+import discord
+
+
+def is_retryable(error):
+    """Rate limits and Discord-side failures are worth retrying; other 4xx errors are not."""
+    return isinstance(error, discord.HTTPException) and (error.status == 429 or error.status >= 500)
+
+
+async def with_retry(call, attempts=4, base_delay=1.0):
+    """Await ``call()``, retrying rate-limited and 5xx responses with exponential backoff.
+
+    discord.py already waits out per-route rate-limit buckets; this covers the
+    429s and server errors that still escape to the caller.
+    """
+    for attempt in range(attempts):
+        try:
+            return await call()
+        except discord.HTTPException as e:
+            if attempt == attempts - 1 or not is_retryable(e):
+                raise
+            retry_after = getattr(e, "retry_after", None)
+            delay = retry_after if retry_after else base_delay * (2 ** attempt)
+            await asyncio.sleep(delay + random.uniform(0, 0.5))
+
+
+async def run_bounded(items, worker, concurrency=3, on_progress=None, progress_every=50):
+    """Run ``worker(item)`` for every item with at most ``concurrency`` in flight.
+
+    Items can be any iterable; they are pulled lazily so large batches are never
+    copied. ``on_progress(done, failed)`` is awaited every ``progress_every`` items
+    and once at the end. Returns ``(done, failed)`` where failed is a list of
+    ``(item, exception)`` pairs.
+    """
+    iterator = iter(items)
+    done = 0
+    failed = []
+
+    async def run_worker():
+        nonlocal done
+        for item in iterator:
+            try:
+                await worker(item)
+            except Exception as e:
+                failed.append((item, e))
+            done += 1
+            if on_progress and done % progress_every == 0:
+                await on_progress(done, failed)
+
+    await asyncio.gather(*(run_worker() for _ in range(concurrency)))
+    if on_progress:
+        await on_progress(done, failed)
+    return done, failed
@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+
+class BurstCoalescer:
+    """Pass items straight through while a key is quiet, batch them during bursts.
+
+    The first item after ``window`` seconds of silence is sent on its own via
+    ``send_one(key, item)``. Anything arriving within ``window`` of the last send
+    is buffered and delivered together when the window closes via
+    ``send_many(key, items)`` (or ``send_one`` if only one item turned up).
+    """
+
+    def __init__(self, window, send_one, send_many):
+        self.window = window
+        self.send_one = send_one
+        self.send_many = send_many
+        self._last_sent = {}
+        self._buffers = {}
+        self._timers = {}
+
+    async def add(self, key, item):
+        buffer = self._buffers.get(key)
+        if buffer is not None:
+            buffer.append(item)
+            return
+
+        now = time.monotonic()
+        last_sent = self._last_sent.get(key)
+        if last_sent is None or now - last_sent >= self.window:
+            self._last_sent[key] = now
+            await self.send_one(key, item)
+            return
+
+        self._buffers[key] = [item]
+        delay = last_sent + self.window - now
+        self._timers[key] = asyncio.create_task(self._flush_later(key, delay))
+
+    async def _flush_later(self, key, delay):
+        await asyncio.sleep(delay)
+        self._timers.pop(key, None)
+        await self._flush(key)
+
+    async def _flush(self, key):
+        items = self._buffers.pop(key, None)
+        if not items:
+            return
+        self._last_sent[key] = time.monotonic()
+        try:
+            if len(items) == 1:
+                await self.send_one(key, items[0])
+            else:
+                await self.send_many(key, items)
+        except Exception as e:
+            print(f"⚠️ Failed to send batched announcement: {e}")
+
+    async def close(self):
+        """Cancel pending timers and send whatever is still buffered."""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        for key in list(self._buffers):
+            await self._flush(key)
@@ -0,0 +1,62 @@
+import json
+import os
+from collections import deque
+
+
+class CooldownTable:
+    """Fixed-window cooldowns that forget keys once their window has passed.
+
+    Every key gets the same window, so expiries are appended to a deque in
+    (roughly) ascending order and ``sweep()`` only ever pops the expired head.
+    Checking a key is a single dict lookup.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self._expires = {}
+        self._queue = deque()
+        self.changed = False
+
+    def __len__(self):
+        return len(self._expires)
+
+    def try_acquire(self, key, now):
+        """Start the cooldown for key and return True, or return False if it is still cooling down."""
+        expires = self._expires.get(key)
+        if expires is not None and now < expires:
+            return False
+        expires = now + self.window
+        self._expires[key] = expires
+        self._queue.append((expires, key))
+        self.changed = True
+        return True
+
+    def sweep(self, now):
+        """Drop every key whose window has passed."""
+        queue = self._queue
+        while queue and queue[0][0] <= now:
+            expires, key = queue.popleft()
+            # A key re-acquired later has a newer expiry queued behind this one
+            if self._expires.get(key) == expires:
+                del self._expires[key]
+
+    def snapshot(self, now):
+        """Return the live cooldowns as {"guild-user": last_grant_timestamp}."""
+        self.sweep(now)
+        self.changed = False
+        return {f"{guild_id}-{user_id}": expires - self.window
+                for (guild_id, user_id), expires in self._expires.items()}
+
+    def load(self, path, now):
+        """Restore a snapshot written by ``snapshot()``, skipping anything already expired."""
+        if not os.path.exists(path):
+            return
+        with open(path, "r") as f:
+            saved = json.load(f)
+        for key, last_time in sorted(saved.items(), key=lambda item: item[1]):
+            expires = last_time + self.window
+            if expires <= now:
+                continue
+            guild_id, user_id = key.split("-", 1)
+            self._expires[(int(guild_id), int(user_id))] = expires
+            self._queue.append((expires, (int(guild_id), int(user_id))))
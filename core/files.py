@@ -0,0 +1,27 @@
+import json
+import os
+import tempfile
+
+
+def atomic_write(path, text):
+    """Write text to path via a temp file + rename so readers never see a half-written file."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path, data):
+    """Serialize data compactly and write it atomically."""
+    atomic_write(path, json.dumps(data, separators=(",", ":")))
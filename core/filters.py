@@ -0,0 +1,191 @@
+import json
+import os
+import re
+import time
+from collections import deque
+from typing import NamedTuple
+
+# When several rules match, the most severe action wins
+ACTION_SEVERITY = {"log": 1, "delete": 2, "mute": 3}
+
+# Written to data/filters/default.json the first time filters are loaded; a guild
+# can override it with data/filters/<guild_id>.json
+DEFAULT_FILTERS = {
+    "rules": [
+        {"name": "invite", "regex": r"discord\.gg/|discord(?:app)?\.com/invite/",
+         "action": "delete", "notice": "🚫 Invite links are not allowed."},
+        {"name": "grabber", "terms": ["grabify", "iplogger"],
+         "action": "delete", "notice": "🚫 Malicious links are not allowed."},
+        {"name": "caps", "caps": {"min_upper": 16, "max_length": 49},
+         "action": "delete", "notice": "🚫 Too many capital letters. Please chill."},
+        {"name": "banned_words", "terms": ["badword1", "badword2"],
+         "action": "delete", "notice": "🚫 That word isn't allowed here."},
+    ]
+}
+
+
+class AhoCorasick:
+    """Multi-term substring matcher: one pass over the text finds every term, however many there are."""
+
+    def __init__(self, terms):
+        # terms: iterable of (term, payload); states are list indexes
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for term, payload in terms:
+            if not term:
+                continue
+            state = 0
+            for char in term:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = next_state
+            self._out[state].append((len(term), payload))
+        self._build_links()
+
+    def _build_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                # Every term ending at the fallback state also ends here
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def __bool__(self):
+        return len(self._goto) > 1
+
+    def find(self, text):
+        """Yield ``(start, end, payload)`` for every term occurrence in text."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, payload in out[state]:
+                yield index + 1 - length, index + 1, payload
+
+
+class FilterRule(NamedTuple):
+    name: str
+    action: str
+    notice: str
+    whole_words: bool
+    mute_minutes: int
+
+
+class FilterResult(NamedTuple):
+    matches: list  # [(rule_name, matched_text)]
+    rule: FilterRule  # the rule whose action is taken
+    action: str
+
+
+class CompiledFilters:
+    """One guild's filter config compiled into an Aho-Corasick automaton, one combined regex and caps checks."""
+
+    def __init__(self, config):
+        self.rules = []
+        terms, patterns, self.caps = [], [], []
+        for index, spec in enumerate(config.get("rules", [])):
+            action = spec.get("action", "delete")
+            if action not in ACTION_SEVERITY:
+                raise ValueError(f"unknown filter action {action!r}")
+            rule = FilterRule(spec.get("name", f"rule{index}"), action, spec.get("notice"),
+                              spec.get("whole_words", False), spec.get("mute_minutes", 10))
+            self.rules.append(rule)
+            terms.extend((term.lower(), rule) for term in spec.get("terms", []))
+            if spec.get("regex"):
+                re.compile(spec["regex"])  # Fail on the rule that is broken, not the combined pattern
+                patterns.append(f"(?P<r{index}>{spec['regex']})")
+            if spec.get("caps"):
+                self.caps.append((spec["caps"].get("min_upper", 16), spec["caps"].get("max_length"), rule))
+        self.terms = AhoCorasick(terms)
+        self.pattern = re.compile("|".join(patterns), re.IGNORECASE) if patterns else None
+        self._pattern_rules = {f"r{index}": rule for index, rule in enumerate(self.rules)}
+
+    def scan(self, ctx):
+        """Scan a ``MessageContext`` once against every rule. Returns a FilterResult, or None if it is clean."""
+        matches = []
+        text = ctx.lowered
+        for start, end, rule in self.terms.find(text):
+            if rule.whole_words and ((start and text[start - 1].isalnum()) or (end < len(text) and text[end].isalnum())):
+                continue
+            matches.append((rule, text[start:end]))
+        if self.pattern is not None:
+            for match in self.pattern.finditer(ctx.content):
+                matches.append((self._pattern_rules[match.lastgroup], match.group()))
+        for min_upper, max_length, rule in self.caps:
+            if ctx.upper_count >= min_upper and (max_length is None or len(ctx.content) <= max_length):
+                matches.append((rule, f"{ctx.upper_count} capitals"))
+        if not matches:
+            return None
+        # Ties go to whichever rule comes first in the config
+        rule = max((rule for rule, _ in matches), key=lambda rule: (ACTION_SEVERITY[rule.action], -self.rules.index(rule)))
+        return FilterResult([(rule.name, text) for rule, text in matches], rule, rule.action)
+
+
+class FilterEngine:
+    """Per-guild compiled filters, reloaded when their config file changes on disk.
+
+    Config files are only stat'ed once every ``check_interval`` seconds per guild,
+    so the per-message cost is the scan itself.
+    """
+
+    def __init__(self, directory, default=DEFAULT_FILTERS, check_interval=5):
+        self.directory = directory
+        self.default = default
+        self.check_interval = check_interval
+        self._compiled = {}  # path -> (mtime, CompiledFilters)
+        self._checked = {}  # guild_id -> (checked_at, path)
+
+    def _path_for(self, guild_id):
+        path = os.path.join(self.directory, f"{guild_id}.json")
+        if os.path.exists(path):
+            return path
+        default_path = os.path.join(self.directory, "default.json")
+        if not os.path.exists(default_path):
+            os.makedirs(self.directory, exist_ok=True)
+            with open(default_path, "w", encoding="utf-8") as f:
+                json.dump(self.default, f, indent=4, ensure_ascii=False)
+        return default_path
+
+    def for_guild(self, guild_id, now=None):
+        """Return the guild's compiled filters, recompiling them if the config file changed."""
+        now = now or time.monotonic()
+        checked = self._checked.get(guild_id)
+        if checked and now - checked[0] < self.check_interval and checked[1] in self._compiled:
+            return self._compiled[checked[1]][1]
+
+        path = self._path_for(guild_id)
+        self._checked[guild_id] = (now, path)
+        mtime = os.path.getmtime(path)
+        cached = self._compiled.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                compiled = CompiledFilters(json.load(f))
+        except (OSError, ValueError, re.error) as e:
+            # Keep filtering with the last good version until the file is fixed
+            print(f"⚠️ Failed to load filters from {path}: {e}")
+            if cached:
+                self._compiled[path] = (mtime, cached[1])
+                return cached[1]
+            compiled = CompiledFilters(self.default)
+        else:
+            print(f"[Filters] Loaded {len(compiled.rules)} rules from {path}.")
+        self._compiled[path] = (mtime, compiled)
+        return compiled
+
+    def scan(self, guild_id, ctx):
+        return self.for_guild(guild_id).scan(ctx)
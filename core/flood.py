@@ -0,0 +1,43 @@
+from collections import OrderedDict, deque
+
+
+class FloodDetector:
+    """Sliding-window rate check: trips when ``limit`` messages for one key land within ``window`` seconds.
+
+    Each key keeps a ring buffer of its last ``limit`` timestamps, so a check is
+    O(1): the buffer is full and its oldest entry is inside the window. Buffers
+    live in an OrderedDict in least-recently-used order; any buffer idle for
+    longer than the window can no longer trip and is evicted from the front.
+    """
+
+    def __init__(self, limit, window, max_keys=50_000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._buffers = OrderedDict()
+
+    def __len__(self):
+        return len(self._buffers)
+
+    def hit(self, key, now):
+        """Record a message for key at ``now``; return True if the key is flooding."""
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = deque(maxlen=self.limit)
+        else:
+            self._buffers.move_to_end(key)
+        buffer.append(now)
+        self._evict(now)
+        return len(buffer) == self.limit and now - buffer[0] <= self.window
+
+    def reset(self, key):
+        """Forget a key's history, e.g. after acting on it."""
+        self._buffers.pop(key, None)
+
+    def _evict(self, now):
+        buffers = self._buffers
+        while buffers:
+            key, buffer = next(iter(buffers.items()))
+            if now - buffer[-1] <= self.window and len(buffers) <= self.max_keys:
+                break
+            del buffers[key]
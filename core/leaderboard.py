@@ -0,0 +1,76 @@
+from sortedcontainers import SortedList
+
+_ID_BITS = 64
+_ID_MASK = (1 << _ID_BITS) - 1
+
+
+def _key(member_id, xp):
+    # Packs (-xp, member_id) into one int: sorts by XP descending, then by ID
+    return (-xp << _ID_BITS) | member_id
+
+
+class LeaderboardIndex:
+    """Order-statistic index of one guild's members by XP (highest first).
+
+    Members are kept as packed integer keys in a SortedList, so updating a member,
+    finding their position and slicing a page are all O(log n). Current XP is read
+    from the guild's ``GuildRanks`` table rather than duplicated here.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self._sorted = SortedList(_key(member_id, xp) for member_id, xp, _ in table.items())
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def __contains__(self, member_id):
+        return member_id in self.table
+
+    def update(self, member_id, old_xp):
+        """Re-rank a member after their XP changed from ``old_xp`` (None if they are new).
+
+        Returns the 0-based ``(first, last)`` span of positions whose entries changed,
+        or None if nothing moved.
+        """
+        xp = self.table.get(member_id).xp
+        if old_xp == xp:
+            return None
+        if old_xp is not None:
+            old_index = self._sorted.index(_key(member_id, old_xp))
+            self._sorted.remove(_key(member_id, old_xp))
+        else:
+            # A new member shifts everyone from their slot to the current end
+            old_index = len(self._sorted)
+        self._sorted.add(_key(member_id, xp))
+        new_index = self._sorted.index(_key(member_id, xp))
+        return min(old_index, new_index), max(old_index, new_index)
+
+    def position(self, member_id):
+        """Return a member's 1-based leaderboard position, or None if they are not ranked."""
+        rank = self.table.get(member_id)
+        if rank is None:
+            return None
+        return self._sorted.index(_key(member_id, rank.xp)) + 1
+
+    def slice(self, start, stop):
+        """Return ``(position, member_id, xp)`` for 0-based positions start..stop-1."""
+        start = max(start, 0)
+        stop = max(stop, start)
+        return [(position, key & _ID_MASK, -(key >> _ID_BITS))
+                for position, key in enumerate(self._sorted.islice(start, stop), start=start + 1)]
+
+    def page(self, page, per_page=10):
+        """Return the entries shown on a 1-based leaderboard page."""
+        start = (page - 1) * per_page
+        return self.slice(start, start + per_page)
+
+    def total_pages(self, per_page=10):
+        return -(-len(self._sorted) // per_page)
+
+    def around(self, member_id, radius=2):
+        """Return the entries within ``radius`` places of a member, including the member."""
+        position = self.position(member_id)
+        if position is None:
+            return []
+        return self.slice(position - 1 - radius, position + radius)
@@ -0,0 +1,102 @@
+import json
+import os
+from bisect import bisect_right
+
+
+class LevelTable:
+    """Level thresholds compiled for bisect lookups.
+
+    Indexing still yields ``(xp_required, role_name)`` pairs so the table reads
+    like the plain list it replaces. ``aliases`` maps older role names to current
+    ones, so guilds that still have roles under the old names keep using them.
+    """
+
+    def __init__(self, levels, aliases=None):
+        levels = sorted((int(xp), name) for xp, name in levels)
+        self.thresholds = [xp for xp, _ in levels]
+        self.names = [name for _, name in levels]
+        self.index_by_name = {name: index for index, name in enumerate(self.names)}
+        for alias, name in (aliases or {}).items():
+            if name in self.index_by_name:
+                self.index_by_name.setdefault(alias, self.index_by_name[name])
+
+    @classmethod
+    def load(cls, path, default, aliases=None):
+        """Load the table from a JSON file of [xp, name] pairs, writing ``default`` there if it is missing."""
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                return cls(json.load(f), aliases)
+        with open(path, "w") as f:
+            json.dump(default, f, indent=4)
+        return cls(default, aliases)
+
+    def __len__(self):
+        return len(self.thresholds)
+
+    def __getitem__(self, index):
+        return self.thresholds[index], self.names[index]
+
+    def level_for(self, xp):
+        """Return the highest level index whose threshold ``xp`` has reached."""
+        return max(bisect_right(self.thresholds, xp) - 1, 0)
+
+
+class LevelRoleCache:
+    """Per-guild map of level index to role ID, kept current from role events.
+
+    When a level has roles under both its current name and an alias, the current
+    name wins, but every matching role still counts as a level role so members
+    holding the other one have it swapped out.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self._roles = {}
+        self._all = {}
+
+    def build(self, guild):
+        """(Re)index a guild's level roles by name in one pass over its roles."""
+        mapping, all_ids = {}, set()
+        for role in guild.roles:
+            index = self.table.index_by_name.get(role.name)
+            if index is None:
+                continue
+            all_ids.add(role.id)
+            self._place(guild, mapping, index, role)
+        self._roles[guild.id] = mapping
+        self._all[guild.id] = all_ids
+        return mapping
+
+    def _place(self, guild, mapping, index, role):
+        """Map ``index`` to ``role`` unless it already has a role under the current name."""
+        current = guild.get_role(mapping[index]) if index in mapping else None
+        if current is None or (current.name != self.table.names[index] and role.name == self.table.names[index]):
+            mapping[index] = role.id
+
+    def roles_for(self, guild):
+        mapping = self._roles.get(guild.id)
+        if mapping is None:
+            mapping = self.build(guild)
+        return mapping
+
+    def role_id(self, guild, level_index):
+        return self.roles_for(guild).get(level_index)
+
+    def role_ids(self, guild):
+        """Every level role in the guild, including duplicates under an alias."""
+        self.roles_for(guild)
+        return set(self._all[guild.id])
+
+    def add(self, role):
+        index = self.table.index_by_name.get(role.name)
+        if index is not None:
+            self._place(role.guild, self.roles_for(role.guild), index, role)
+            self._all[role.guild.id].add(role.id)
+
+    def is_relevant(self, role):
+        """True if a role change could affect the guild's level-role map."""
+        return role.name in self.table.index_by_name or role.id in self.role_ids(role.guild)
+
+    def forget(self, guild_id):
+        self._roles.pop(guild_id, None)
+        self._all.pop(guild_id, None)
@@ -0,0 +1,247 @@
+import asyncio
+import glob
+import json
+import os
+import time
+
+import discord
+
+from core.bulk import with_retry
+
+# Discord limits: 4096 characters per embed description, 6000 per message, 10 embeds per message
+EMBED_CHARS = 4000
+MESSAGE_CHARS = 5800
+MESSAGE_EMBEDS = 10
+
+
+class AuditLog:
+    """Rotating JSONL journal of moderation actions with in-memory indexes.
+
+    Records go to ``audit.<n>.jsonl`` segments; a segment is closed once it passes
+    ``segment_bytes`` and only the newest ``keep_segments`` are kept. The indexes
+    map ``(guild_id, "user", id)``, ``(guild_id, "action", name)`` and
+    ``(guild_id,)`` to the (segment, offset) of each record, oldest first, so a
+    query seeks straight to its records instead of reading whole files.
+    """
+
+    def __init__(self, directory, segment_bytes=1_000_000, keep_segments=20):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.keep_segments = keep_segments
+        self._index = {}
+        self._segment = 0
+        self._lock = asyncio.Lock()
+
+    def _path(self, segment):
+        return os.path.join(self.directory, f"audit.{segment:06d}.jsonl")
+
+    def _segments(self):
+        paths = glob.glob(os.path.join(glob.escape(self.directory), "audit.*.jsonl"))
+        return sorted(int(os.path.basename(path).split(".")[1]) for path in paths)
+
+    @staticmethod
+    def _keys(record):
+        guild_id = record["guild"]
+        keys = [(guild_id,), (guild_id, "action", record["action"])]
+        for field in ("user", "moderator"):
+            if record.get(field):
+                keys.append((guild_id, "user", record[field]))
+        # A moderator acting on themselves would otherwise be indexed twice
+        return list(dict.fromkeys(keys))
+
+    def load(self):
+        """Rebuild the indexes from the segments on disk."""
+        os.makedirs(self.directory, exist_ok=True)
+        self._index = {}
+        segments = self._segments()
+        for segment in segments:
+            with open(self._path(segment), "rb") as f:
+                offset = 0
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        record = None
+                    if record is not None:
+                        for key in self._keys(record):
+                            self._index.setdefault(key, []).append((segment, offset))
+                    offset += len(line)
+        self._segment = segments[-1] if segments else 0
+
+    def _write(self, records):
+        """Append records to the current segment (rotating first if it is full). Runs in a thread."""
+        path = self._path(self._segment)
+        dropped = []
+        if os.path.exists(path) and os.path.getsize(path) >= self.segment_bytes:
+            self._segment += 1
+            path = self._path(self._segment)
+            segments = self._segments()
+            for old in segments[:max(len(segments) + 1 - self.keep_segments, 0)]:
+                os.remove(self._path(old))
+                dropped.append(old)
+        positions = []
+        with open(path, "ab") as f:
+            for record in records:
+                positions.append((self._segment, f.tell()))
+                f.write(json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return positions, dropped
+
+    async def append(self, records):
+        if not records:
+            return
+        async with self._lock:
+            positions, dropped = await asyncio.to_thread(self._write, records)
+        if dropped:
+            dropped = set(dropped)
+            for key, entries in list(self._index.items()):
+                entries[:] = [entry for entry in entries if entry[0] not in dropped]
+                if not entries:
+                    del self._index[key]
+        for record, position in zip(records, positions):
+            for key in self._keys(record):
+                self._index.setdefault(key, []).append(position)
+
+    def _read(self, positions):
+        records = []
+        handles = {}
+        try:
+            for segment, offset in positions:
+                f = handles.get(segment)
+                if f is None:
+                    try:
+                        f = handles[segment] = open(self._path(segment), "rb")
+                    except FileNotFoundError:
+                        continue
+                f.seek(offset)
+                records.append(json.loads(f.readline()))
+        finally:
+            for f in handles.values():
+                f.close()
+        return records
+
+    async def query(self, guild_id, user_id=None, action=None, limit=10):
+        """Return the newest matching records for a guild, newest first."""
+        keys = [(guild_id, "user", user_id) if user_id else None, (guild_id, "action", action) if action else None]
+        keys = [key for key in keys if key] or [(guild_id,)]
+        lists = [self._index.get(key, []) for key in keys]
+        if len(lists) == 1:
+            positions = lists[0][-limit:]
+        else:
+            # Both lists are in write order, so intersect them walking back from the newest entries
+            first, second = lists
+            i, j = len(first) - 1, len(second) - 1
+            positions = []
+            while i >= 0 and j >= 0 and len(positions) < limit:
+                if first[i] == second[j]:
+                    positions.append(first[i])
+                    i -= 1
+                    j -= 1
+                elif first[i] > second[j]:
+                    i -= 1
+                else:
+                    j -= 1
+            positions.reverse()
+        records = await asyncio.to_thread(self._read, positions)
+        return list(reversed(records))
+
+
+class ModLogSink:
+    """Buffers mod-log lines per guild and posts them as embeds every ``interval`` seconds.
+
+    The log channel is looked up by name once per guild and cached by ID. Every
+    line is also written to the ``AuditLog`` as a structured record.
+    """
+
+    def __init__(self, bot, channel_name, audit, interval=3):
+        self.bot = bot
+        self.channel_name = channel_name
+        self.audit = audit
+        self.interval = interval
+        self._channels = {}
+        self._lines = {}
+        self._records = []
+        self._task = None
+
+    def start(self):
+        self.audit.load()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+        await self.flush()
+
+    def channel_for(self, guild):
+        """Return the guild's mod-log channel, caching its ID after the first name lookup."""
+        channel = guild.get_channel(self._channels.get(guild.id, 0))
+        if channel is None or channel.name != self.channel_name:
+            channel = discord.utils.get(guild.text_channels, name=self.channel_name)
+            if channel:
+                self._channels[guild.id] = channel.id
+            else:
+                self._channels.pop(guild.id, None)
+        return channel
+
+    def forget(self, guild_id):
+        self._channels.pop(guild_id, None)
+
+    def log(self, guild, text, action, user=None, moderator=None, post=True, **details):
+        """Queue a line for the guild's mod-log (unless ``post`` is False) and an audit record. Never waits on Discord."""
+        if post:
+            self._lines.setdefault(guild.id, []).append(text)
+        record = {"ts": round(time.time(), 3), "guild": guild.id, "action": action,
+                  "user": getattr(user, "id", user), "moderator": getattr(moderator, "id", moderator), "text": text}
+        record.update(details)
+        self._records.append(record)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"⚠️ Failed to flush mod log: {e}")
+
+    async def flush(self):
+        records, self._records = self._records, []
+        try:
+            await self.audit.append(records)
+        except OSError as e:
+            print(f"⚠️ Failed to write audit log: {e}")
+            self._records[:0] = records
+
+        pending, self._lines = self._lines, {}
+        for guild_id, lines in pending.items():
+            guild = self.bot.get_guild(guild_id)
+            channel = self.channel_for(guild) if guild else None
+            if channel is None:
+                continue
+            for embeds in self._pack(lines):
+                try:
+                    await with_retry(lambda: channel.send(embeds=embeds))
+                except discord.HTTPException as e:
+                    print(f"⚠️ Failed to post to #{channel} in {guild.name}: {e}")
+                    break
+
+    @staticmethod
+    def _pack(lines):
+        """Group lines into embeds, and embeds into messages, within Discord's size limits."""
+        messages, embeds, chunk, message_chars = [], [], "", 0
+        for line in lines:
+            line = line[:EMBED_CHARS - 1]
+            if len(chunk) + len(line) + 1 > EMBED_CHARS:
+                embeds.append(chunk)
+                message_chars += len(chunk)
+                chunk = ""
+            if embeds and (message_chars + len(chunk) + len(line) + 1 > MESSAGE_CHARS or len(embeds) == MESSAGE_EMBEDS):
+                messages.append(embeds)
+                embeds, message_chars = [], 0
+            chunk += line + "\n"
+        if chunk:
+            embeds.append(chunk)
+        if embeds:
+            messages.append(embeds)
+        return [[discord.Embed(description=description, color=discord.Color.dark_grey()) for description in message]
+                for message in messages]
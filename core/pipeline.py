@@ -0,0 +1,120 @@
+import re
+import time
+
+# Stages run lowest priority first; moderation goes before anything that rewards a message
+PRIORITY_RATE_LIMIT = 5
+PRIORITY_MODERATION = 10
+PRIORITY_DEFAULT = 50
+PRIORITY_XP = 100
+
+URL_PATTERN = re.compile(r"https?://\S+|\bwww\.\S+|\b(?:discord\.gg|discord(?:app)?\.com/invite)/\S+", re.IGNORECASE)
+
+
+class MessageContext:
+    """One message parsed once and shared by every stage.
+
+    A stage that removes the message calls ``delete()``, which marks the context
+    so the remaining stages are skipped.
+    """
+
+    __slots__ = ("message", "content", "lowered", "urls", "mention_count", "upper_count",
+                 "letter_count", "caps_ratio", "deleted", "stopped_by")
+
+    def __init__(self, message):
+        self.message = message
+        self.content = content = message.content
+        self.lowered = content.lower()
+        self.urls = URL_PATTERN.findall(content)
+        self.mention_count = len(message.raw_mentions) + len(message.raw_role_mentions) + message.mention_everyone
+        self.upper_count = sum(1 for c in content if c.isupper())
+        self.letter_count = sum(1 for c in content if c.isalpha())
+        self.caps_ratio = self.upper_count / self.letter_count if self.letter_count else 0.0
+        self.deleted = False
+        self.stopped_by = None
+
+    async def delete(self, notice=None):
+        """Delete the message (posting an optional short-lived notice) and stop the pipeline."""
+        self.deleted = True
+        try:
+            await self.message.delete()
+        except Exception as e:
+            print(f"⚠️ Failed to delete message {self.message.id}: {e}")
+        if notice:
+            await self.message.channel.send(notice, delete_after=5)
+
+
+class StageStats:
+    __slots__ = ("calls", "total", "slowest", "stops", "errors")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.stops = 0
+        self.errors = 0
+
+    def record(self, elapsed):
+        self.calls += 1
+        self.total += elapsed
+        if elapsed > self.slowest:
+            self.slowest = elapsed
+
+
+class MessagePipeline:
+    """The bot's single ``on_message`` listener.
+
+    Skips bots and DMs, builds one ``MessageContext`` per message and runs the
+    registered stages in priority order. Each stage is timed, and the run ends as
+    soon as a stage deletes the message.
+    """
+
+    def __init__(self):
+        self._stages = []
+        self.stats = {}
+
+    def register(self, name, callback, priority=PRIORITY_DEFAULT):
+        """Add (or replace) a stage: ``async callback(ctx)``."""
+        self.unregister(name)
+        self._stages.append((priority, name, callback))
+        self._stages.sort(key=lambda stage: (stage[0], stage[1]))
+        self.stats.setdefault(name, StageStats())
+
+    def unregister(self, name):
+        self._stages = [stage for stage in self._stages if stage[1] != name]
+
+    async def on_message(self, message):
+        if message.author.bot or not message.guild:
+            return
+        ctx = MessageContext(message)
+        for _, name, callback in self._stages:
+            stats = self.stats[name]
+            started = time.perf_counter()
+            try:
+                await callback(ctx)
+            except Exception as e:
+                stats.errors += 1
+                print(f"⚠️ Message stage {name} failed: {e}")
+            stats.record(time.perf_counter() - started)
+            if ctx.deleted:
+                stats.stops += 1
+                ctx.stopped_by = name
+                break
+        return ctx
+
+    def report(self):
+        """Return ``(name, calls, avg_ms, max_ms, stops, errors)`` for every registered stage, in run order."""
+        rows = []
+        for _, name, _ in self._stages:
+            stats = self.stats[name]
+            average = stats.total / stats.calls * 1000 if stats.calls else 0.0
+            rows.append((name, stats.calls, average, stats.slowest * 1000, stats.stops, stats.errors))
+        return rows
+
+
+def get_pipeline(bot):
+    """Return the bot's message pipeline, creating it and registering its listener on first use."""
+    pipeline = getattr(bot, "message_pipeline", None)
+    if pipeline is None:
+        pipeline = bot.message_pipeline = MessagePipeline()
+        bot.add_listener(pipeline.on_message, "on_message")
+    return pipeline
@@ -0,0 +1,122 @@
+import asyncio
+import re
+from datetime import timedelta
+
+import discord
+
+from core.bulk import with_retry
+
+# Discord only bulk-deletes messages younger than 14 days; keep a margin for clock skew
+BULK_DELETE_MAX_AGE = timedelta(days=14) - timedelta(minutes=10)
+BULK_DELETE_SIZE = 100
+
+_AGE = re.compile(r"(?:\d+[smhdw])+")
+_AGE_PART = re.compile(r"(\d+)([smhdw])")
+_AGE_UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+
+def parse_age(text):
+    """Parse an age like ``30m``, ``12h``, ``7d`` or ``1w2d`` into a timedelta."""
+    text = text.lower().replace(" ", "")
+    if not _AGE.fullmatch(text):
+        raise ValueError(f"couldn't read {text!r} as an age (try 30m, 12h, 7d)")
+    age = timedelta()
+    for amount, unit in _AGE_PART.findall(text):
+        age += timedelta(**{_AGE_UNITS[unit]: int(amount)})
+    return age
+
+
+class PurgeFilter:
+    """Predicate over messages: every given condition must hold."""
+
+    def __init__(self, author_ids=(), pattern=None, attachments=None, skip_ids=()):
+        self.author_ids = frozenset(author_ids)
+        self.pattern = pattern
+        self.attachments = attachments
+        self.skip_ids = frozenset(skip_ids)
+
+    def __call__(self, message):
+        if message.id in self.skip_ids:
+            return False
+        if self.author_ids and message.author.id not in self.author_ids:
+            return False
+        if self.attachments is not None and bool(message.attachments) != self.attachments:
+            return False
+        if self.pattern is not None and not self.pattern.search(message.content):
+            return False
+        return True
+
+
+class PurgeStats:
+    __slots__ = ("channel", "scanned", "matched", "bulk_deleted", "single_deleted", "failed", "sample")
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.scanned = 0
+        self.matched = 0
+        self.bulk_deleted = 0
+        self.single_deleted = 0
+        self.failed = 0
+        self.sample = []
+
+    @property
+    def deleted(self):
+        return self.bulk_deleted + self.single_deleted
+
+
+async def purge_channel(channel, matches, limit, scan, before=None, after=None, dry_run=False,
+                        on_progress=None, progress_every=500, single_delay=1.0):
+    """Stream a channel's history newest-first and delete up to ``limit`` messages that ``matches``.
+
+    At most ``scan`` messages are read, and only one bulk batch (100 messages) is
+    ever held in memory. Messages under 14 days old are deleted with
+    ``delete_messages`` in batches of 100; older ones fall back to single deletes
+    spaced ``single_delay`` seconds apart. A dry run only counts and samples.
+    """
+    stats = PurgeStats(channel)
+    bulk_cutoff = discord.utils.utcnow() - BULK_DELETE_MAX_AGE
+    batch = []
+
+    async def flush():
+        try:
+            await with_retry(lambda: channel.delete_messages(batch, reason="Purge"))
+            stats.bulk_deleted += len(batch)
+        except discord.HTTPException as e:
+            print(f"⚠️ Bulk delete failed in #{channel}: {e}")
+            stats.failed += len(batch)
+        batch.clear()
+
+    async for message in channel.history(limit=scan, before=before, after=after, oldest_first=False):
+        stats.scanned += 1
+        if on_progress and stats.scanned % progress_every == 0:
+            await on_progress(stats)
+        if not matches(message):
+            continue
+        stats.matched += 1
+
+        if dry_run:
+            if len(stats.sample) < 5:
+                stats.sample.append(message)
+        elif message.created_at > bulk_cutoff:
+            batch.append(message)
+            if len(batch) == BULK_DELETE_SIZE:
+                await flush()
+        else:
+            try:
+                await with_retry(message.delete)
+                stats.single_deleted += 1
+            except discord.NotFound:
+                pass
+            except discord.HTTPException as e:
+                print(f"⚠️ Failed to delete message {message.id} in #{channel}: {e}")
+                stats.failed += 1
+            await asyncio.sleep(single_delay)
+
+        if stats.matched >= limit:
+            break
+
+    if batch:
+        await flush()
+    if on_progress:
+        await on_progress(stats)
+    return stats
@@ -0,0 +1,137 @@
+import random
+import re
+from collections import deque
+from typing import NamedTuple
+
+_NON_WORD = re.compile(r"[\W_]+")
+_SHINGLE = 4
+_MAX_SHINGLES = 1024
+_HASHES = 16
+# Fixed random masks; XOR-ing the 32-bit shingle hashes with each stands in for a permutation
+_random = random.Random(0x5EED)
+_MASKS = [_random.getrandbits(32) for _ in range(_HASHES)]
+
+
+def normalize(text):
+    """Lowercase, drop punctuation and collapse whitespace so trivial edits fingerprint the same."""
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def minhash(text):
+    """MinHash signature (a tuple of 16 ints) of a normalized string's character 4-grams.
+
+    The share of positions two signatures agree on estimates the Jaccard
+    similarity of their shingle sets. Shingles go through the built-in (per
+    process salted) ``hash``, which is fine for an index that only lives in memory.
+    """
+    shingles = {hash(text[i:i + _SHINGLE]) & 0xFFFFFFFF
+                for i in range(min(max(len(text) - _SHINGLE + 1, 1), _MAX_SHINGLES))}
+    return tuple(min(shingle ^ mask for shingle in shingles) for mask in _MASKS)
+
+
+def similarity(left, right):
+    return sum(x == y for x, y in zip(left, right)) / len(left)
+
+
+class Post(NamedTuple):
+    at: float
+    signature: tuple
+    guild_id: int
+    channel_id: int
+    message_id: int
+    user_id: int
+
+
+class RaidHit(NamedTuple):
+    posts: list  # every post to act on
+    new: bool  # True when this message tipped a cluster over the threshold
+
+
+class RaidDetector:
+    """Short-lived index of message signatures that spots many users posting near-identical text.
+
+    Signatures are cut into ``bands`` slices and each slice is an exact-match
+    bucket (locality-sensitive hashing), so a new message only compares against
+    the few posts sharing one of its buckets instead of everything recent. A
+    bucket keeps only each member's latest post, so one member repeating
+    themselves can't grow it and a check costs about ``users`` comparisons per
+    band. Posts older than ``window`` are evicted from the head of a time-ordered queue.
+
+    Once a cluster trips, its signature stays flagged for the window so later
+    copies are caught on sight.
+    """
+
+    def __init__(self, users, window, threshold=0.7, min_length=20, bands=8):
+        self.users = users
+        self.window = window
+        self.threshold = threshold
+        self.min_length = min_length
+        self.bands = bands
+        self._rows = _HASHES // bands
+        self._buckets = {}  # (guild_id, band, slice) -> {user_id: latest Post}
+        self._queue = deque()
+        self._flagged = {}  # (guild_id, band, slice) -> [(signature, flagged_at)]
+
+    def _keys(self, guild_id, signature):
+        rows = self._rows
+        return [(guild_id, band, signature[band * rows:(band + 1) * rows]) for band in range(self.bands)]
+
+    def check(self, guild_id, channel_id, message_id, user_id, text, now):
+        """Index a message and return a RaidHit if it belongs to a raid, else None."""
+        self._evict(now)
+        text = normalize(text)
+        if len(text) < self.min_length:
+            return None
+        signature = minhash(text)
+        post = Post(now, signature, guild_id, channel_id, message_id, user_id)
+        keys = self._keys(guild_id, signature)
+
+        # A copy of a raid we already acted on
+        for key in keys:
+            for flagged, _ in self._flagged.get(key, ()):
+                if similarity(flagged, signature) >= self.threshold:
+                    return RaidHit([post], False)
+
+        similar = {}
+        for key in keys:
+            for other in self._buckets.get(key, {}).values():
+                if (other.user_id != user_id and other.message_id not in similar
+                        and similarity(other.signature, signature) >= self.threshold):
+                    similar[other.message_id] = other
+        for key in keys:
+            self._buckets.setdefault(key, {})[user_id] = post
+        self._queue.append(post)
+
+        users = {other.user_id for other in similar.values()} | {user_id}
+        if len(users) <= self.users:
+            return None
+
+        # Tripped: flag the signature and hand back the whole cluster
+        cluster = list(similar.values()) + [post]
+        for other in cluster:
+            self._discard(other)
+        for key in keys:
+            self._flagged.setdefault(key, []).append((signature, now))
+        return RaidHit(cluster, True)
+
+    def _discard(self, post):
+        for key in self._keys(post.guild_id, post.signature):
+            bucket = self._buckets.get(key)
+            # Only if a newer post from the same member hasn't replaced it
+            if bucket is not None and bucket.get(post.user_id) is post:
+                del bucket[post.user_id]
+                if not bucket:
+                    del self._buckets[key]
+
+    def _evict(self, now):
+        cutoff = now - self.window
+        queue = self._queue
+        while queue and queue[0].at < cutoff:
+            self._discard(queue.popleft())
+        # Only non-empty while a raid is being handled, so this stays small
+        for key in list(self._flagged):
+            live = [(signature, at) for signature, at in self._flagged[key] if at >= cutoff]
+            if live:
+                self._flagged[key] = live
+            else:
+                del self._flagged[key]
@@ -0,0 +1,152 @@
+"""Rank card images, rendered with Pillow in a pool of worker processes.
+
+Pillow is optional: if it is missing, ``AVAILABLE`` is False and callers fall back
+to the text embed.
+"""
+import asyncio
+import io
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+AVAILABLE = Image is not None
+
+CARD_SIZE = (934, 282)
+AVATAR_SIZE = 200
+BAR_BOX = (270, 200, 894, 236)
+TEXT_COLOR = (255, 255, 255)
+MUTED_COLOR = (170, 176, 190)
+ACCENT_COLOR = (88, 101, 242)
+TRACK_COLOR = (64, 68, 75)
+BACKGROUND_COLOR = (35, 39, 42)
+
+# Set once per worker process by _init_worker
+_fonts = None
+_background = None
+_avatar_mask = None
+
+
+def _load_font(path, size):
+    try:
+        return ImageFont.truetype(path, size)
+    except OSError:
+        return ImageFont.load_default(size)
+
+
+def _init_worker(font_path, bold_font_path, background_path):
+    """Load fonts, the background and the avatar mask once, when a worker process starts."""
+    global _fonts, _background, _avatar_mask
+    _fonts = {
+        "name": _load_font(bold_font_path, 40),
+        "level": _load_font(font_path, 30),
+        "small": _load_font(font_path, 24),
+        "position": _load_font(bold_font_path, 48),
+    }
+    if background_path and os.path.exists(background_path):
+        _background = Image.open(background_path).convert("RGBA").resize(CARD_SIZE)
+    else:
+        _background = Image.new("RGBA", CARD_SIZE, BACKGROUND_COLOR)
+    _avatar_mask = Image.new("L", (AVATAR_SIZE, AVATAR_SIZE), 0)
+    ImageDraw.Draw(_avatar_mask).ellipse((0, 0, AVATAR_SIZE, AVATAR_SIZE), fill=255)
+
+
+def render_card(card):
+    """Render one rank card and return it as PNG bytes. Runs inside a worker process.
+
+    ``card`` is a plain dict so it pickles cheaply: name, level, level_name, xp,
+    floor and next (XP bounds of the current level; next is None at the top),
+    position and avatar (PNG/JPEG bytes or None).
+    """
+    image = _background.copy()
+    draw = ImageDraw.Draw(image)
+
+    if card["avatar"]:
+        avatar = Image.open(io.BytesIO(card["avatar"])).convert("RGBA").resize((AVATAR_SIZE, AVATAR_SIZE))
+        image.paste(avatar, (40, 41), _avatar_mask)
+    else:
+        draw.ellipse((40, 41, 40 + AVATAR_SIZE, 41 + AVATAR_SIZE), fill=TRACK_COLOR)
+
+    draw.text((270, 40), card["name"][:24], font=_fonts["name"], fill=TEXT_COLOR)
+    draw.text((270, 95), f"Level {card['level']} - {card['level_name']}", font=_fonts["level"], fill=MUTED_COLOR)
+    if card["position"]:
+        draw.text((CARD_SIZE[0] - 40, 40), f"#{card['position']}", font=_fonts["position"],
+                  fill=ACCENT_COLOR, anchor="ra")
+
+    # Progress through the current level; the top level shows a full bar
+    if card["next"] is None:
+        progress, xp_text = 1.0, f"{card['xp']} XP (max level)"
+    else:
+        span = max(card["next"] - card["floor"], 1)
+        progress = min(max((card["xp"] - card["floor"]) / span, 0.0), 1.0)
+        xp_text = f"{card['xp']} / {card['next']} XP"
+    draw.text((BAR_BOX[2], BAR_BOX[1] - 12), xp_text, font=_fonts["small"], fill=MUTED_COLOR, anchor="rb")
+
+    left, top, right, bottom = BAR_BOX
+    radius = (bottom - top) // 2
+    draw.rounded_rectangle(BAR_BOX, radius=radius, fill=TRACK_COLOR)
+    filled = left + int((right - left) * progress)
+    if filled - left >= 2 * radius:
+        draw.rounded_rectangle((left, top, filled, bottom), radius=radius, fill=ACCENT_COLOR)
+
+    output = io.BytesIO()
+    image.convert("RGB").save(output, format="PNG", optimize=False)
+    return output.getvalue()
+
+
+class RankCardRenderer:
+    """Renders rank cards off the event loop and keeps recent ones in an LRU cache.
+
+    The process pool is started on first use with the "spawn" start method, so
+    workers never inherit the bot's event loop or threads. Concurrent requests for
+    the same card share one render.
+    """
+
+    def __init__(self, workers=2, cache_size=256, font_path="DejaVuSans.ttf",
+                 bold_font_path="DejaVuSans-Bold.ttf", background_path=None):
+        self.workers = workers
+        self.cache_size = cache_size
+        self.init_args = (font_path, bold_font_path, background_path)
+        self._pool = None
+        self._cache = OrderedDict()
+        self._inflight = {}
+
+    def cached(self, key):
+        """Return the cached PNG for key (marking it recently used), or None."""
+        png = self._cache.get(key)
+        if png is not None:
+            self._cache.move_to_end(key)
+        return png
+
+    async def render(self, key, card):
+        """Return PNG bytes for the card, rendering it in the pool unless it is cached."""
+        png = self.cached(key)
+        if png is not None:
+            return png
+        future = self._inflight.get(key)
+        if future is None:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=_init_worker, initargs=self.init_args)
+            future = asyncio.get_running_loop().run_in_executor(self._pool, render_card, card)
+            self._inflight[key] = future
+            try:
+                png = await future
+            finally:
+                self._inflight.pop(key, None)
+            self._cache[key] = png
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return png
+        return await asyncio.shield(future)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,346 @@
+import asyncio
+import glob
+import json
+import os
+import time
+
+from core.files import atomic_write
+from core.leaderboard import LeaderboardIndex
+from core.rank_table import GuildRanks
+from core.seasons import SeasonScores, season_key
+
+SNAPSHOT_FORMAT = 2
+
+
+class RankStore:
+    """In-memory rank data backed by a snapshot plus an append-only journal.
+
+    Each guild is a compact ``GuildRanks`` table keyed by int member IDs, plus a
+    ``SeasonScores`` table for the current monthly season. Every XP grant or level
+    change is queued as a small JSON line and ``flush()`` appends the batch to the
+    journal. Records carry the member's absolute values, so replaying them over a
+    snapshot is idempotent. Once the journal grows past ``compact_bytes`` it is
+    folded into a new snapshot (only dirty guilds are re-serialized) and the old
+    journal is kept as an archived segment for auditing.
+
+    Leaderboards are keyed by ``(guild_id, season)`` where season is None for
+    lifetime XP.
+    """
+
+    def __init__(self, path, journal_path, seasons_dir, decay, compact_bytes=1_000_000, keep_archives=10):
+        self.path = path
+        self.journal_path = journal_path
+        self.seasons_dir = seasons_dir
+        self.decay = decay
+        self.compact_bytes = compact_bytes
+        self.keep_archives = keep_archives
+        self.guilds = {}
+        self.season_key = season_key(time.time())
+        self.season = {}
+        self.archives = {}
+        self._pending = []
+        self._dirty = set()
+        self._fragments = {}
+        self._boards = {}
+        # Called as on_reorder((guild_id, season), first, last) when leaderboard positions shift
+        self.on_reorder = None
+        self._flush_lock = asyncio.Lock()
+
+    def load(self):
+        """Load the last snapshot (converting the legacy layout) and replay the journal on top of it."""
+        legacy = False
+        self.season = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+            if saved.get("format") == SNAPSHOT_FORMAT:
+                self.guilds = {int(guild_id): GuildRanks.from_json(table)
+                               for guild_id, table in saved["guilds"].items()}
+                season = saved.get("season") or {}
+                if season.get("key"):
+                    self.season_key = season["key"]
+                    self.season = {int(guild_id): SeasonScores.from_json(table, self.decay)
+                                   for guild_id, table in season["guilds"].items()}
+            else:
+                legacy = bool(saved)
+                self.guilds = {int(guild_id): GuildRanks.from_legacy(users) for guild_id, users in saved.items()}
+        else:
+            self.guilds = {}
+        replayed = self._replay()
+        self._pending = []
+        self._dirty = set(self.guilds) | set(self.season)
+        self._fragments = {}
+        self._boards = {}
+        if replayed:
+            print(f"[Ranks] Replayed {replayed} journal records.")
+        if legacy or not os.path.exists(self.path):
+            # Rewrite in the compact format right away so the next start skips the conversion
+            self._rotate_journal(self._render(self._take_dirty()))
+
+    def _replay(self):
+        if not os.path.exists(self.journal_path):
+            return 0
+        replayed = 0
+        with open(self.journal_path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-append can leave a torn final line
+                    continue
+                guild_id, user_id = int(entry["g"]), int(entry["u"])
+                self.table(guild_id).set(user_id, entry["xp"], entry["level"])
+                if entry.get("s") == self.season_key:
+                    self.season_table(guild_id).set(user_id, entry["sxp"], entry["sa"], entry["sd"])
+                replayed += 1
+        return replayed
+
+    def table(self, guild_id):
+        """Return the guild's table, creating an empty one if needed."""
+        table = self.guilds.get(guild_id)
+        if table is None:
+            table = self.guilds[guild_id] = GuildRanks()
+        return table
+
+    def season_table(self, guild_id):
+        """Return the guild's table for the current season, creating an empty one if needed."""
+        table = self.season.get(guild_id)
+        if table is None:
+            table = self.season[guild_id] = SeasonScores(self.decay)
+        return table
+
+    def guild(self, guild_id):
+        """Return the guild's table, or an empty one (not stored) if the guild has no data."""
+        return self.guilds.get(int(guild_id)) or GuildRanks()
+
+    def get(self, guild_id, user_id):
+        """Return a member's ``Rank(xp, level)``, or None if they have no XP yet."""
+        table = self.guilds.get(int(guild_id))
+        return table.get(int(user_id)) if table is not None else None
+
+    def add_xp(self, guild_id, user_id, amount, source="message", now=None):
+        """Grant XP to a member's lifetime and current-season totals. Returns their new lifetime Rank."""
+        guild_id, user_id = int(guild_id), int(user_id)
+        now = now or time.time()
+        table = self.table(guild_id)
+        old = table.get(user_id)
+        slot = table.ensure(user_id)
+        table.xp[slot] += amount
+        self._moved((guild_id, None), user_id, old.xp if old else None)
+
+        season = self.season_table(guild_id)
+        old_score = season.get(user_id)
+        season.add(user_id, amount, now)
+        self._moved((guild_id, self.season_key), user_id, old_score.xp if old_score else None)
+
+        rank = table.get(user_id)
+        self._journal(guild_id, user_id, rank, source, delta=amount)
+        return rank
+
+    def _moved(self, board_key, user_id, old_xp):
+        board = self._boards.get(board_key)
+        if board is not None:
+            span = board.update(user_id, old_xp)
+            if span and self.on_reorder:
+                self.on_reorder(board_key, *span)
+
+    def set_level(self, guild_id, user_id, level):
+        """Record a level change for a member."""
+        guild_id, user_id = int(guild_id), int(user_id)
+        table = self.table(guild_id)
+        table.level[table.ensure(user_id)] = level
+        rank = table.get(user_id)
+        self._journal(guild_id, user_id, rank, "level")
+        return rank
+
+    def bulk_merge(self, guild_id, totals, level_for, source="backfill"):
+        """Raise members to at least the given lifetime XP totals in one batch.
+
+        Taking the max keeps a rerun (or XP already earned live) from being counted
+        twice. Levels are recomputed with ``level_for`` but never lowered.
+        Returns the number of members that changed.
+        """
+        guild_id = int(guild_id)
+        table = self.table(guild_id)
+        changed = 0
+        for user_id, xp in totals.items():
+            user_id = int(user_id)
+            slot = table.ensure(user_id)
+            if xp <= table.xp[slot]:
+                continue
+            delta = xp - table.xp[slot]
+            table.xp[slot] = xp
+            table.level[slot] = max(table.level[slot], level_for(xp))
+            self._journal(guild_id, user_id, table.get(user_id), source, delta=delta)
+            changed += 1
+        # Positions may have moved anywhere, so rebuild the index and drop every cached page
+        board = self._boards.pop((guild_id, None), None)
+        if board is not None and self.on_reorder:
+            self.on_reorder((guild_id, None), 0, len(table))
+        return changed
+
+    def _journal(self, guild_id, user_id, rank, source, delta=0):
+        entry = {"ts": round(time.time(), 3), "g": guild_id, "u": user_id,
+                 "xp": rank.xp, "level": rank.level, "d": delta, "src": source}
+        season = self.season.get(guild_id)
+        if season is not None and user_id in season:
+            entry["s"] = self.season_key
+            entry["sxp"], entry["sa"], entry["sd"] = season.row(user_id)
+        self._pending.append(entry)
+        self._dirty.add(guild_id)
+
+    def leaderboard(self, guild_id, season=None):
+        """Return the lifetime (or given season's) leaderboard index, building it on first use."""
+        board_key = (int(guild_id), season)
+        board = self._boards.get(board_key)
+        if board is None:
+            if season is None:
+                table = self.table(board_key[0])
+            elif season == self.season_key:
+                table = self.season_table(board_key[0])
+            else:
+                table = self.archived_season(season).get(board_key[0]) or SeasonScores(self.decay, ended_at=0)
+            board = self._boards[board_key] = LeaderboardIndex(table)
+        return board
+
+    def season_score(self, guild_id, user_id, season, now=None):
+        """Return a member's ``SeasonScore`` for a season, settling any pending decay first."""
+        guild_id, user_id = int(guild_id), int(user_id)
+        if season == self.season_key:
+            self.settle_decay(guild_id, [user_id], now)
+            table = self.season.get(guild_id)
+        else:
+            table = self.archived_season(season).get(guild_id)
+        return table.get(user_id) if table is not None else None
+
+    def settle_decay(self, guild_id, user_ids, now=None):
+        """Apply pending decay to the given members of the current season. Returns True if any score moved."""
+        table = self.season.get(int(guild_id))
+        if table is None:
+            return False
+        now = now or time.time()
+        moved = False
+        for user_id in user_ids:
+            old_xp = table.touch(user_id, now)
+            if old_xp is not None:
+                self._moved((int(guild_id), self.season_key), user_id, old_xp)
+                moved = True
+        return moved
+
+    def seasons(self):
+        """Return every known season key, newest first."""
+        keys = {self.season_key} | set(self.archives)
+        if os.path.isdir(self.seasons_dir):
+            keys |= {name[:-5] for name in os.listdir(self.seasons_dir) if name.endswith(".json")}
+        return sorted(keys, reverse=True)
+
+    def archived_season(self, season):
+        """Return ``{guild_id: SeasonScores}`` for a finished season, loading it from disk on first use."""
+        tables = self.archives.get(season)
+        if tables is None:
+            path = os.path.join(self.seasons_dir, f"{season}.json")
+            tables = {}
+            if os.path.exists(path):
+                with open(path, "r") as f:
+                    saved = json.load(f)
+                tables = {int(guild_id): SeasonScores.from_json(table, self.decay, ended_at=saved["ended_at"])
+                          for guild_id, table in saved["guilds"].items()}
+            self.archives[season] = tables
+        return tables
+
+    async def rollover(self, new_key, now=None):
+        """Close the current season and start ``new_key``.
+
+        The finished tables are frozen in place and handed to the archive as-is;
+        nothing is copied. Their snapshot file is written off the event loop.
+        """
+        async with self._flush_lock:
+            now = now or time.time()
+            old_key, finished = self.season_key, self.season
+            for table in finished.values():
+                table.ended_at = now
+            self.archives[old_key] = finished
+            # Switch seasons before the first await, so grants made while the journal and archive are written
+            # land in the new season instead of mutating the tables being serialized
+            self.season_key, self.season = new_key, {}
+            for board_key in [key for key in self._boards if key[1] == old_key]:
+                board = self._boards.pop(board_key)
+                if self.on_reorder:
+                    self.on_reorder(board_key, 0, len(board))
+            self._dirty |= set(finished)
+
+            await self._flush_pending()
+            path = os.path.join(self.seasons_dir, f"{old_key}.json")
+            # Frozen and detached tables are never written again, so they can be serialized off the loop
+            await asyncio.to_thread(self._write_archive, path, old_key, now, finished)
+            await self._compact()
+
+    @staticmethod
+    def _write_archive(path, key, ended_at, tables):
+        archive = {"key": key, "ended_at": ended_at,
+                   "guilds": {str(guild_id): table.to_json() for guild_id, table in tables.items()}}
+        atomic_write(path, json.dumps(archive, separators=(",", ":")))
+
+    def _append(self, lines):
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        return os.path.getsize(self.journal_path)
+
+    def _take_dirty(self):
+        dirty, self._dirty = self._dirty, set()
+        return dirty
+
+    def _render(self, dirty):
+        """Serialize dirty guilds and assemble the whole snapshot from cached fragments."""
+        for guild_id in dirty:
+            for kind, tables in (("lifetime", self.guilds), ("season", self.season)):
+                if guild_id in tables:
+                    self._fragments[kind, guild_id] = json.dumps(tables[guild_id].to_json(), separators=(",", ":"))
+                else:
+                    self._fragments.pop((kind, guild_id), None)
+
+        def section(kind):
+            return ",".join(f'"{guild_id}":{fragment}'
+                            for (fragment_kind, guild_id), fragment in self._fragments.items() if fragment_kind == kind)
+
+        return (f'{{"format":{SNAPSHOT_FORMAT},"guilds":{{{section("lifetime")}}},'
+                f'"season":{{"key":{json.dumps(self.season_key)},"guilds":{{{section("season")}}}}}}}')
+
+    def _rotate_journal(self, snapshot):
+        """Swap in a new snapshot, then archive the journal it already contains."""
+        atomic_write(self.path, snapshot)
+        if os.path.exists(self.journal_path):
+            os.replace(self.journal_path, f"{self.journal_path}.{int(time.time() * 1000)}")
+        archives = sorted(glob.glob(f"{glob.escape(self.journal_path)}.*"))
+        for old in archives[:-self.keep_archives or None]:
+            os.remove(old)
+
+    async def flush(self):
+        """Append queued records to the journal and compact it once it is large enough."""
+        async with self._flush_lock:
+            size = await self._flush_pending()
+            if size >= self.compact_bytes:
+                await self._compact()
+
+    async def _flush_pending(self):
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, []
+        lines = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in batch)
+        try:
+            return await asyncio.to_thread(self._append, lines)
+        except Exception:
+            # Put the batch back so the next flush retries it
+            self._pending[:0] = batch
+            raise
+
+    async def _compact(self):
+        dirty = self._take_dirty()
+        try:
+            snapshot = self._render(dirty)
+            await asyncio.to_thread(self._rotate_journal, snapshot)
+        except Exception:
+            self._dirty |= dirty
+            raise
@@ -0,0 +1,83 @@
+from array import array
+from bisect import bisect_left
+from typing import NamedTuple
+
+
+class Rank(NamedTuple):
+    xp: int
+    level: int
+
+
+class GuildRanks:
+    """Column-oriented XP table for one guild.
+
+    Member IDs, XP and levels live in parallel typed arrays (8 + 8 + 1 bytes per
+    member), with rows kept sorted by member ID so a row is found by bisecting
+    ``ids``, instead of a dict of string IDs to ``{"xp": ..., "level": ...}``
+    dicts. Row numbers shift when a member is inserted, so only hold one until
+    the next ``ensure()``.
+    """
+
+    __slots__ = ("ids", "xp", "level")
+
+    def __init__(self):
+        self.ids = array("Q")
+        self.xp = array("q")
+        self.level = array("B")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, member_id):
+        return self.slot(member_id) is not None
+
+    def slot(self, member_id):
+        """Return the member's row, or None if they have none."""
+        slot = bisect_left(self.ids, member_id)
+        if slot < len(self.ids) and self.ids[slot] == member_id:
+            return slot
+        return None
+
+    def get(self, member_id):
+        slot = self.slot(member_id)
+        if slot is None:
+            return None
+        return Rank(self.xp[slot], self.level[slot])
+
+    def ensure(self, member_id):
+        """Return the member's row, inserting a zeroed one in ID order if they are new."""
+        slot = bisect_left(self.ids, member_id)
+        if slot == len(self.ids) or self.ids[slot] != member_id:
+            self.ids.insert(slot, member_id)
+            self.xp.insert(slot, 0)
+            self.level.insert(slot, 0)
+        return slot
+
+    def set(self, member_id, xp, level):
+        slot = self.ensure(member_id)
+        self.xp[slot] = xp
+        self.level[slot] = level
+
+    def items(self):
+        """Yield ``(member_id, xp, level)`` for every row."""
+        return zip(self.ids, self.xp, self.level)
+
+    def to_json(self):
+        return {"ids": self.ids.tolist(), "xp": self.xp.tolist(), "level": self.level.tolist()}
+
+    @classmethod
+    def from_json(cls, data):
+        # Snapshots written before rows were kept in ID order need sorting once
+        rows = sorted(zip(data["ids"], data["xp"], data["level"]))
+        table = cls()
+        table.ids = array("Q", (member_id for member_id, _, _ in rows))
+        table.xp = array("q", (xp for _, xp, _ in rows))
+        table.level = array("B", (level for _, _, level in rows))
+        return table
+
+    @classmethod
+    def from_legacy(cls, users):
+        """Convert the old ``{"user_id": {"xp": ..., "level": ...}}`` layout."""
+        return cls.from_json({"ids": [int(user_id) for user_id in users],
+                              "xp": [record["xp"] for record in users.values()],
+                              "level": [record["level"] for record in users.values()]})
@@ -0,0 +1,87 @@
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import time
+
+from core.files import atomic_write_json
+
+
+class ExpiryScheduler:
+    """Persisted min-heap of timed actions (e.g. unmute / unban), fired at their exact deadline.
+
+    Each action is keyed by ``(kind, guild_id, user_id)``; scheduling a key again
+    replaces its deadline and cancelling just forgets it, with stale heap entries
+    skipped when they reach the top. The runner sleeps until the earliest deadline
+    (or until something earlier is scheduled), so there is no polling, and actions
+    that came due while the bot was offline fire as soon as it starts.
+    """
+
+    def __init__(self, path, handler, retry_delay=60):
+        self.path = path
+        self.handler = handler  # async handler(kind, guild_id, user_id)
+        self.retry_delay = retry_delay
+        self._heap = []
+        self._due = {}
+        self._counter = itertools.count()
+        self._wake = asyncio.Event()
+
+    def __len__(self):
+        return len(self._due)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            saved = json.load(f)
+        for kind, guild_id, user_id, due in saved:
+            self._due[(kind, guild_id, user_id)] = due
+        self._heap = [(due, next(self._counter), key) for key, due in self._due.items()]
+        heapq.heapify(self._heap)
+
+    async def save(self):
+        entries = [[kind, guild_id, user_id, due] for (kind, guild_id, user_id), due in self._due.items()]
+        await asyncio.to_thread(atomic_write_json, self.path, entries)
+
+    async def schedule(self, kind, guild_id, user_id, due):
+        """Run the action for this key at ``due`` (a Unix timestamp), replacing any earlier schedule."""
+        key = (kind, guild_id, user_id)
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, next(self._counter), key))
+        self._wake.set()
+        await self.save()
+
+    async def cancel(self, kind, guild_id, user_id):
+        if self._due.pop((kind, guild_id, user_id), None) is not None:
+            await self.save()
+
+    async def run(self):
+        """Fire actions as they come due, forever."""
+        while True:
+            # Drop heap entries that were cancelled or rescheduled
+            while self._heap and self._due.get(self._heap[0][2]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+
+            self._wake.clear()
+            if not self._heap:
+                await self._wake.wait()
+                continue
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due, _, key = heapq.heappop(self._heap)
+            try:
+                await self.handler(*key)
+            except Exception as e:
+                print(f"⚠️ Scheduled {key[0]} for {key[2]} failed, retrying in {self.retry_delay}s: {e}")
+                await self.schedule(*key, time.time() + self.retry_delay)
+                continue
+            if self._due.get(key) == due:
+                del self._due[key]
+                await self.save()
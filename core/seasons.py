@@ -0,0 +1,145 @@
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+DAY = 86400
+
+
+def season_key(timestamp):
+    """Monthly season identifier, e.g. ``"2026-10"`` (UTC)."""
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y-%m")
+
+
+class SeasonScore(NamedTuple):
+    xp: int
+    last_active: float
+
+
+class Decay:
+    """Exponential inactivity decay: after ``grace_days`` idle, lose ``rate`` of the score per day."""
+
+    def __init__(self, grace_days, rate):
+        self.grace = grace_days * DAY
+        self.rate = rate
+
+    def apply(self, xp, last_active, decayed_until, now):
+        """Return the score after decaying from whichever is later: the grace deadline or the last decay.
+
+        The result is not truncated, so decaying in many small steps lands on the same
+        score as decaying once.
+        """
+        start = max(last_active + self.grace, decayed_until)
+        if now <= start or not xp or not self.rate:
+            return xp
+        return xp * (1 - self.rate) ** ((now - start) / DAY)
+
+
+class SeasonScores:
+    """One guild's scores for one season, stored as parallel arrays like ``GuildRanks``.
+
+    Rows are kept sorted by member ID and found by bisecting ``ids``. Decay is
+    applied lazily: ``touch()`` folds any pending decay into a member's score
+    only when that member is read or written. Scores are kept as floats so
+    repeated touches don't each lose a truncated point; reads report whole
+    points. Once the season ends the table is frozen (``ended_at`` is set) and
+    reads report each score decayed up to the end of the season without
+    modifying anything, so an archived season can be shared as-is instead of copied.
+    """
+
+    __slots__ = ("ids", "xp", "active", "decayed", "decay", "ended_at")
+
+    def __init__(self, decay, ended_at=None):
+        self.ids = array("Q")
+        self.xp = array("d")
+        self.active = array("d")
+        self.decayed = array("d")
+        self.decay = decay
+        self.ended_at = ended_at
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, member_id):
+        return self.slot(member_id) is not None
+
+    def slot(self, member_id):
+        """Return the member's row, or None if they have none."""
+        slot = bisect_left(self.ids, member_id)
+        if slot < len(self.ids) and self.ids[slot] == member_id:
+            return slot
+        return None
+
+    def _insert(self, member_id, xp, last_active, decayed_until):
+        slot = bisect_left(self.ids, member_id)
+        self.ids.insert(slot, member_id)
+        self.xp.insert(slot, xp)
+        self.active.insert(slot, last_active)
+        self.decayed.insert(slot, decayed_until)
+
+    def _score(self, slot):
+        xp = self.xp[slot]
+        if self.ended_at is not None:
+            xp = self.decay.apply(xp, self.active[slot], self.decayed[slot], self.ended_at)
+        return int(xp)
+
+    def get(self, member_id):
+        slot = self.slot(member_id)
+        if slot is None:
+            return None
+        return SeasonScore(self._score(slot), self.active[slot])
+
+    def items(self):
+        """Yield ``(member_id, xp, last_active)`` for every row."""
+        return ((member_id, self._score(slot), self.active[slot]) for slot, member_id in enumerate(self.ids))
+
+    def touch(self, member_id, now):
+        """Fold pending decay into a live member's score; returns the old whole-point score if that changed, else None."""
+        slot = self.slot(member_id)
+        if slot is None or self.ended_at is not None:
+            return None
+        old = self.xp[slot]
+        self.xp[slot] = self.decay.apply(old, self.active[slot], self.decayed[slot], now)
+        self.decayed[slot] = max(self.decayed[slot], now)
+        if int(self.xp[slot]) == int(old):
+            return None
+        return int(old)
+
+    def add(self, member_id, amount, now):
+        """Grant season XP (after settling decay) and mark the member active."""
+        if member_id in self:
+            self.touch(member_id, now)
+        else:
+            self._insert(member_id, 0, now, now)
+        slot = self.slot(member_id)
+        self.xp[slot] += amount
+        self.active[slot] = now
+        self.decayed[slot] = now
+
+    def set(self, member_id, xp, last_active, decayed_until):
+        slot = self.slot(member_id)
+        if slot is None:
+            self._insert(member_id, xp, last_active, decayed_until)
+        else:
+            self.xp[slot] = xp
+            self.active[slot] = last_active
+            self.decayed[slot] = decayed_until
+
+    def row(self, member_id):
+        slot = self.slot(member_id)
+        return self.xp[slot], self.active[slot], self.decayed[slot]
+
+    def to_json(self):
+        return {"ids": self.ids.tolist(), "xp": self.xp.tolist(),
+                "active": self.active.tolist(), "decayed": self.decayed.tolist()}
+
+    @classmethod
+    def from_json(cls, data, decay, ended_at=None):
+        # Tables saved before rows were kept in ID order need sorting once
+        rows = sorted(zip(data["ids"], data["xp"], data["active"], data["decayed"]))
+        table = cls(decay, ended_at)
+        table.ids = array("Q", (row[0] for row in rows))
+        table.xp = array("d", (row[1] for row in rows))
+        table.active = array("d", (row[2] for row in rows))
+        table.decayed = array("d", (row[3] for row in rows))
+        return table
@@ -0,0 +1,64 @@
+import json
+import os
+
+
+class VoiceSessions:
+    """Start times of open voice-XP sessions, keyed by ``(guild_id, member_id)``.
+
+    Sessions are opened and closed from voice state events only; nothing polls the
+    members sitting in voice. The start times are snapshotted to disk so a session
+    that spans a restart is still credited from when it began.
+    """
+
+    def __init__(self):
+        self._started = {}
+        self.changed = False
+        # When the snapshot or heartbeat was last written; sessions found stale after a restart end here
+        self.saved_at = None
+
+    def __len__(self):
+        return len(self._started)
+
+    def __contains__(self, key):
+        return key in self._started
+
+    def keys(self):
+        return set(self._started)
+
+    def open(self, key, now):
+        """Start a session unless one is already running for key."""
+        if key not in self._started:
+            self._started[key] = now
+            self.changed = True
+
+    def close(self, key, now):
+        """End a session and return how many seconds it lasted, or None if none was open."""
+        started = self._started.pop(key, None)
+        if started is None:
+            return None
+        self.changed = True
+        return max(0.0, now - started)
+
+    def snapshot(self, now):
+        """Return the open sessions as {"saved_at": ..., "sessions": {"guild-user": started}}."""
+        self.changed = False
+        self.saved_at = now
+        return {"saved_at": now,
+                "sessions": {f"{guild_id}-{member_id}": started
+                             for (guild_id, member_id), started in self._started.items()}}
+
+    def load(self, path, heartbeat_path=None):
+        """Restore a snapshot written by ``snapshot()``, plus a later heartbeat ``{"saved_at": ...}`` if there is one."""
+        if not os.path.exists(path):
+            return
+        with open(path, "r") as f:
+            saved = json.load(f)
+        self.saved_at = saved.get("saved_at")
+        if heartbeat_path and os.path.exists(heartbeat_path):
+            with open(heartbeat_path, "r") as f:
+                beat = json.load(f).get("saved_at")
+            if beat and self.saved_at and beat > self.saved_at:
+                self.saved_at = beat
+        for key, started in saved.get("sessions", {}).items():
+            guild_id, member_id = key.split("-", 1)
+            self._started[(int(guild_id), int(member_id))] = started
@@ -0,0 +1,41 @@
+"""The message rules for earning XP, shared by live grants and history backfills."""
+
+XP_MIN_LENGTH = 10
+XP_COOLDOWN_SECONDS = 300
+XP_MIN_GAIN = 5
+XP_MAX_GAIN = 15
+
+# Backfilled grants count as the midpoint of the random range so reruns are deterministic
+BACKFILL_XP_PER_GRANT = (XP_MIN_GAIN + XP_MAX_GAIN) // 2
+
+
+def earns_xp(message, prefix):
+    """True if a message is eligible for XP: human author, in a guild, long enough, not a command."""
+    if message.author.bot or not message.guild:
+        return False
+    return eligible_content(message.content, prefix)
+
+
+def eligible_content(content, prefix):
+    """The content half of ``earns_xp``, for callers that already filtered out bots and DMs."""
+    return len(content) >= XP_MIN_LENGTH and not content.startswith(prefix)
+
+
+# Voice time earns a flat rate, credited when a session closes
+VOICE_XP_PER_MINUTE = 2
+
+
+def voice_earners(channel):
+    """IDs of the members in a voice channel who earn voice XP right now.
+
+    Bots, muted or deafened members and the AFK channel never earn, and nobody
+    earns while they are the only person in the channel.
+    """
+    if channel is None or channel == channel.guild.afk_channel:
+        return set()
+    humans = [member for member in channel.members if not member.bot]
+    if len(humans) < 2:
+        return set()
+    return {member.id for member in humans
+            if member.voice and not (member.voice.self_mute or member.voice.mute
+                                     or member.voice.self_deaf or member.voice.deaf)}
@@ -38,7 +38,11 @@ async def load_cogs():
 
 # Main entry point
 async def main():
-    await load_cogs()
-    await bot.start(TOKEN)
-
-asyncio.run(main())
+    # "async with" closes the bot on shutdown, which unloads cogs so they can flush their data
+    async with bot:
+        await load_cogs()
+        await bot.start(TOKEN)
+
+# Guarded so worker processes (e.g. the rank card renderer) can import this module without starting the bot
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""Offline XP backfill: crawl channel history and write the result to the rank store.
+
+Run from the repository root while the bot itself is stopped (both write the same
+rank files):
+
+    python -m tools.backfill_xp              # every guild the bot is in
+    python -m tools.backfill_xp 1234 5678    # only these guild IDs
+
+Interrupted crawls resume from data/backfill/<guild_id>.json on the next run.
+"""
+import asyncio
+import os
+import sys
+import time
+
+import discord
+from dotenv import load_dotenv
+
+from cogs.ranks import BACKFILL_STATE_DIR, DATA_FILE, JOURNAL_FILE, LEVELS, SEASON_DECAY, SEASONS_DIR, XP_PREFIX
+from core.backfill import HistoryBackfill
+from core.rank_store import RankStore
+
+load_dotenv()
+
+
+async def backfill(client, guild_ids):
+    store = RankStore(DATA_FILE, JOURNAL_FILE, SEASONS_DIR, SEASON_DECAY)
+    store.load()
+    guilds = [guild for guild in client.guilds if not guild_ids or guild.id in guild_ids]
+    for guild in guilds:
+        print(f"[Backfill] Crawling {guild.name} ({len(guild.text_channels)} text channels)…")
+        started = time.monotonic()
+        crawler = HistoryBackfill(guild, os.path.join(BACKFILL_STATE_DIR, f"{guild.id}.json"), XP_PREFIX)
+
+        async def report(scanned, users):
+            print(f"[Backfill] {guild.name}: {scanned:,} messages scanned, {users:,} members found")
+
+        totals = await crawler.run(on_progress=report)
+        changed = store.bulk_merge(guild.id, totals, LEVELS.level_for)
+        await store.flush()
+        crawler.clear_checkpoint()
+        print(f"[Backfill] {guild.name}: {crawler.scanned:,} messages, {changed:,} members updated "
+              f"in {time.monotonic() - started:.0f}s")
+
+
+def main():
+    token = os.getenv("DISCORD_TOKEN")
+    if not token:
+        raise ValueError("❌ DISCORD_TOKEN is not set in the .env file.")
+    guild_ids = {int(arg) for arg in sys.argv[1:]}
+
+    intents = discord.Intents.default()
+    intents.message_content = True
+    client = discord.Client(intents=intents)
+
+    @client.event
+    async def on_ready():
+        try:
+            await backfill(client, guild_ids)
+        finally:
+            await client.close()
+
+    asyncio.run(client.start(token))
+
+
+if __name__ == "__main__":
+    main()
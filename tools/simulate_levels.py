@@ -0,0 +1,177 @@
+"""Offline level-curve simulator.
+
+Models XP accumulation for every ranked member under one or more candidate level
+curves and reports the resulting level distribution and time-to-level percentiles,
+so thresholds can be tuned before touching data/levels.json.
+
+    python -m tools.simulate_levels                                # current curve
+    python -m tools.simulate_levels --curve data/levels.json --curve new_curve.json
+    python -m tools.simulate_levels --history counts.json --window-days 30 --days 90
+
+``--history`` is an optional JSON file of ``{"user_id": eligible_message_count}``
+(or ``{"guild_id": {"user_id": count}}``) covering the last ``--window-days`` days.
+It gives each member a grant rate; without it, grants are estimated from current
+XP and time-to-level is reported in grants instead of days.
+
+Every XP grant is an independent uniform draw from the same 5-15 range as
+RankCog, so the simulator draws a bank of ``--trials`` full XP trajectories in
+one vectorized pass, assigns each member ``--samples`` random trajectories and
+reads their outcomes off the cumulative sums. A 100k-member guild takes seconds.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from core.rank_table import GuildRanks
+from core.xp_rules import XP_MAX_GAIN, XP_MIN_GAIN
+
+DATA_FILE = "data/ranks_data.json"
+LEVELS_FILE = "data/levels.json"
+
+
+def load_members(path, guild_id=None):
+    """Return ``(member_ids, xp)`` arrays from a rank snapshot (either on-disk format)."""
+    with open(path, "r") as f:
+        saved = json.load(f)
+    if saved.get("format") == 2:
+        tables = {gid: GuildRanks.from_json(table) for gid, table in saved["guilds"].items()}
+    else:
+        tables = {gid: GuildRanks.from_legacy(users) for gid, users in saved.items()}
+    if guild_id:
+        tables = {gid: table for gid, table in tables.items() if gid == str(guild_id)}
+    ids = np.concatenate([np.frombuffer(table.ids, dtype=np.uint64) for table in tables.values()] or [np.zeros(0, np.uint64)])
+    xp = np.concatenate([np.frombuffer(table.xp, dtype=np.int64) for table in tables.values()] or [np.zeros(0, np.int64)])
+    return ids, xp
+
+
+def load_history(path, member_ids):
+    """Return eligible message counts aligned with ``member_ids`` (0 for members not in the file)."""
+    with open(path, "r") as f:
+        history = json.load(f)
+    counts = {}
+    for key, value in history.items():
+        if isinstance(value, dict):
+            counts.update({int(user_id): count for user_id, count in value.items()})
+        else:
+            counts[int(key)] = value
+    return np.array([counts.get(int(member_id), 0) for member_id in member_ids], dtype=np.float64)
+
+
+def load_curve(path):
+    with open(path, "r") as f:
+        levels = sorted((int(xp), name) for xp, name in json.load(f))
+    return np.array([xp for xp, _ in levels], dtype=np.int64), [name for _, name in levels]
+
+
+def simulate_trajectories(rng, trials, max_grants):
+    """Cumulative XP after each grant for ``trials`` independent members, shape (trials, max_grants)."""
+    draws = rng.integers(XP_MIN_GAIN, XP_MAX_GAIN + 1, size=(trials, max_grants), dtype=np.int32)
+    return np.cumsum(draws, axis=1, dtype=np.int64)
+
+
+def grants_to_reach(trajectories, thresholds):
+    """Grants needed to reach each threshold in each trajectory, shape (trials, levels); inf if never."""
+    needed = np.empty((trajectories.shape[0], len(thresholds)), dtype=np.float64)
+    for index, threshold in enumerate(thresholds):
+        if threshold <= 0:
+            needed[:, index] = 0
+            continue
+        short = (trajectories < threshold).sum(axis=1)
+        needed[:, index] = np.where(short < trajectories.shape[1], short + 1, np.inf)
+    return needed
+
+
+def xp_after(rng, trajectories, grants, samples):
+    """Sample each member's XP after ``grants`` grants from the trajectory bank, shape (members, samples)."""
+    trials, max_grants = trajectories.shape
+    picks = rng.integers(0, trials, size=(len(grants), samples))
+    steps = np.clip(grants, 0, max_grants).astype(np.int64)
+    xp = np.where(steps[:, None] > 0, trajectories[picks, np.maximum(steps - 1, 0)[:, None]], 0)
+
+    # Beyond the simulated horizon, extend with the mean and variance of the remaining draws
+    extra = np.maximum(grants - max_grants, 0)
+    if extra.any():
+        mean = (XP_MIN_GAIN + XP_MAX_GAIN) / 2
+        variance = ((XP_MAX_GAIN - XP_MIN_GAIN + 1) ** 2 - 1) / 12
+        noise = rng.standard_normal(size=xp.shape) * np.sqrt(extra * variance)[:, None]
+        xp = xp + np.rint(extra[:, None] * mean + noise).astype(np.int64)
+    return xp
+
+
+def report(name, thresholds, level_names, level_counts, grant_pct, day_pct):
+    print(f"\n=== {name} ===")
+    header = f"{'Lvl':>3}  {'Role':<26}{'XP':>7}{'Members':>10}{'Share':>8}   Grants p50/p90"
+    if day_pct is not None:
+        header += "   Days p50/p90 (active members)"
+    print(header)
+    total = level_counts.sum() or 1
+    for index, (threshold, role) in enumerate(zip(thresholds, level_names)):
+        line = (f"{index:>3}  {role[:25]:<26}{threshold:>7}{level_counts[index]:>10.0f}"
+                f"{100 * level_counts[index] / total:>7.1f}%   {grant_pct[0][index]:>6.0f}/{grant_pct[1][index]:<6.0f}")
+        if day_pct is not None:
+            line += f"   {day_pct[0][index]:>6.1f}/{day_pct[1][index]:<6.1f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate member XP under candidate level curves.")
+    parser.add_argument("--data", default=DATA_FILE, help="rank snapshot to read members from")
+    parser.add_argument("--guild", help="only simulate this guild ID")
+    parser.add_argument("--curve", action="append", help="levels JSON to evaluate (repeatable)")
+    parser.add_argument("--history", help="JSON of eligible message counts per member")
+    parser.add_argument("--window-days", type=float, default=30, help="days covered by --history")
+    parser.add_argument("--days", type=float, default=0, help="project this many days into the future")
+    parser.add_argument("--trials", type=int, default=4000, help="simulated XP trajectories in the bank")
+    parser.add_argument("--samples", type=int, default=16, help="trajectories sampled per member")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rng = np.random.default_rng(args.seed)
+    member_ids, current_xp = load_members(args.data, args.guild)
+    if not len(member_ids):
+        raise SystemExit("No ranked members found.")
+    mean_gain = (XP_MIN_GAIN + XP_MAX_GAIN) / 2
+
+    # Grants each member has earned so far, and their grant rate per day if we have history
+    grants = np.rint(current_xp / mean_gain)
+    rate = None
+    if args.history:
+        counts = load_history(args.history, member_ids)
+        rate = counts / args.window_days
+        grants = grants + rate * args.days
+    grants = grants.astype(np.int64)
+
+    curves = args.curve or [LEVELS_FILE]
+    loaded = [load_curve(path) for path in curves]
+    highest = max(int(thresholds[-1]) for thresholds, _ in loaded)
+    # Enough grants to clear the highest threshold even on the minimum roll every time
+    max_grants = int(highest / XP_MIN_GAIN) + 1
+    trajectories = simulate_trajectories(rng, args.trials, max_grants)
+    sampled_xp = xp_after(rng, trajectories, grants, args.samples)
+
+    print(f"Simulated {len(member_ids):,} members × {args.samples} samples "
+          f"from {args.trials:,} trajectories of {max_grants:,} grants")
+    for path, (thresholds, level_names) in zip(curves, loaded):
+        levels = np.searchsorted(thresholds, sampled_xp, side="right") - 1
+        level_counts = np.bincount(levels.ravel(), minlength=len(thresholds)) / args.samples
+
+        needed = grants_to_reach(trajectories, thresholds)
+        grant_pct = np.percentile(needed, [50, 90], axis=0)
+
+        day_pct = None
+        if rate is not None and (rate > 0).any():
+            active = rate[rate > 0]
+            picks = rng.integers(0, args.trials, size=len(active))
+            days = needed[picks] / active[:, None]
+            day_pct = np.percentile(days, [50, 90], axis=0)
+
+        report(path, thresholds, level_names, level_counts, grant_pct, day_pct)
+
+    print(f"\nDone in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()